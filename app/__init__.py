@@ -3,13 +3,18 @@ from app.extensions import db, ma, migrate, celery_init_app, init_s3_client
 from app.config import config
 from app.main import blueprints
 from app.auth.firebase_auth import init_firebase
+from app.cli import register_commands
+from app.utils.worker_lifecycle import init_worker_lifecycle
+from app.utils.prompt_budget import get_token_counter
 
 def create_app():
     app = Flask(__name__)
     app.config.from_object(config)
     app.config["CELERY"] = {
         "broker_url": config.CELERY_BROKER_URL,
-        "result_backend": config.CELERY_RESULT_BACKEND
+        "result_backend": config.CELERY_RESULT_BACKEND,
+        "worker_max_tasks_per_child": config.CELERY_MAX_TASKS_PER_CHILD,
+        "worker_max_memory_per_child": config.CELERY_MAX_MEMORY_PER_CHILD
     }
     
     # Initialize extensions
@@ -19,6 +24,7 @@ def create_app():
     
     # Initialize Celery
     celery_init_app(app)
+    init_worker_lifecycle(app)
     
     # Initialize S3 and check if successful
     s3_success = init_s3_client(app)
@@ -28,6 +34,9 @@ def create_app():
     # Initialize Firebase
     init_firebase()
     
+    # Load the prompt tokenizer now (web and worker processes) rather than inside a request
+    get_token_counter().load()
+    
     # Create database tables
     with app.app_context():
         db.create_all()
@@ -35,5 +44,8 @@ def create_app():
     # Register all blueprints
     for blueprint in blueprints:
         app.register_blueprint(blueprint)
+
+    # Register CLI commands
+    register_commands(app)
     
     return app
\ No newline at end of file
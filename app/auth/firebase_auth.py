@@ -6,14 +6,30 @@ from app.models.user import User
 from app.extensions import db
 import os
 import logging
+from dataclasses import dataclass
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 import requests
 from requests.exceptions import RequestException
 from app.config import config
+from app.utils.cache import LRUCache
+from app.auth.token_cache import token_cache
+from app.auth.health_monitor import FirebaseHealthMonitor
+from app.auth.token_verifier import create_token_verifier
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Selected by FIREBASE_TOKEN_VERIFIER once Firebase is initialized
+token_verifier = None
+
+def get_token_verifier():
+    global token_verifier
+    if token_verifier is None:
+        token_verifier = create_token_verifier(config)
+    return token_verifier
+
 def init_firebase():
     """Initialize Firebase Admin SDK"""
     try:
@@ -34,14 +50,16 @@ def init_firebase():
         except Exception as e:
             logger.error(f"Failed to initialize Firebase Admin SDK: {e}")
             raise
+    get_token_verifier()
+    health_monitor.start()
 
 def check_network_connectivity():
     """Check if we can reach Firebase's servers"""
     try:
         # Test connection to Firebase Auth servers
-        response = requests.get('https://www.googleapis.com/identitytoolkit/v3/relyingparty/publicKeys', timeout=10)
+        response = requests.get(config.FIREBASE_HEALTH_PROBE_URL, timeout=config.FIREBASE_HEALTH_PROBE_TIMEOUT)
         if response.status_code == 200:
-            logger.info("Network connectivity to Firebase servers: OK")
+            logger.debug("Network connectivity to Firebase servers: OK")
             return True
         else:
             logger.warning(f"Firebase servers responded with status code: {response.status_code}")
@@ -50,17 +68,57 @@ def check_network_connectivity():
         logger.error(f"Network connectivity test failed: {e}")
         return False
 
+# Shared per process; probes in the background so requests never wait on it
+health_monitor = FirebaseHealthMonitor(
+    probe=check_network_connectivity,
+    interval=config.FIREBASE_HEALTH_PROBE_INTERVAL,
+    failure_threshold=config.FIREBASE_HEALTH_FAILURE_THRESHOLD
+)
+
+@dataclass(frozen=True)
+class UserHandle:
+    """Lightweight stand-in for the authenticated User stored on the request"""
+    id: int
+    firebase_uid: str
+
+# firebase_uid -> users.id, so warm requests resolve the user without the DB
+identity_cache = LRUCache(maxsize=config.AUTH_IDENTITY_CACHE_SIZE, default_ttl=config.AUTH_IDENTITY_CACHE_TTL)
+
 def get_or_create_user(firebase_uid):
     """Get existing user or create new one from Firebase UID"""
-    user = User.query.filter_by(firebase_uid=firebase_uid).first()
-    if not user:
-        user = User(firebase_uid=firebase_uid)
-        db.session.add(user)
+    user_id = identity_cache.get(firebase_uid)
+    if user_id is None:
+        # Atomic upsert: concurrent first requests can't race on the unique index
+        stmt = pg_insert(User).values(firebase_uid=firebase_uid)\
+            .on_conflict_do_nothing(index_elements=[User.firebase_uid])\
+            .returning(User.id)
+        user_id = db.session.execute(stmt).scalar()
+        if user_id is None:
+            user_id = db.session.execute(
+                select(User.id).where(User.firebase_uid == firebase_uid)
+            ).scalar_one()
+        else:
+            logger.info(f"Created new user with Firebase UID: {firebase_uid}")
         db.session.commit()
-        logger.info(f"Created new user with Firebase UID: {firebase_uid}")
-    else:
-        logger.info(f"Found existing user with Firebase UID: {firebase_uid}")
-    return user
+        identity_cache.set(firebase_uid, user_id)
+    return UserHandle(id=user_id, firebase_uid=firebase_uid)
+
+def verify_token(token, cached_claims=None):
+    """Verify a Firebase ID token, reusing claims from the verified-token cache when given"""
+    if cached_claims is not None:
+        if token_cache.is_revoked(cached_claims):
+            token_cache.discard(token)
+            raise auth.RevokedIdTokenError("The Firebase ID token has been revoked.")
+        return cached_claims
+
+    decoded_token = get_token_verifier().verify(token)
+    token_cache.set(token, decoded_token)
+    return decoded_token
+
+def revoke_user_tokens(firebase_uid):
+    """Revoke a user's refresh tokens and drop their cached ID tokens"""
+    auth.revoke_refresh_tokens(firebase_uid)
+    token_cache.invalidate_user(firebase_uid)
 
 def firebase_auth_required(f):
     @wraps(f)
@@ -72,8 +130,13 @@ def firebase_auth_required(f):
 
         token = auth_header.split('Bearer ')[1]
         
-        # Check network connectivity first
-        if not check_network_connectivity():
+        # Tokens verified earlier need no round trip to Firebase
+        cached_claims = token_cache.get(token)
+
+        # Fail fast while the circuit breaker considers Firebase unreachable
+        # (offline verification only needs the already cached signing keys)
+        needs_firebase = cached_claims is None and get_token_verifier().requires_network
+        if needs_firebase and not health_monitor.is_available():
             logger.error("Cannot reach Firebase servers - network connectivity issue")
             return jsonify({
                 'error': 'Authentication service unavailable',
@@ -82,15 +145,15 @@ def firebase_auth_required(f):
 
         try:
             # Verify the Firebase token
-            logger.info("Attempting to verify Firebase token")
-            decoded_token = auth.verify_id_token(token)
+            logger.debug("Attempting to verify Firebase token")
+            decoded_token = verify_token(token, cached_claims)
             firebase_uid = decoded_token['uid']
-            logger.info(f"Token verified successfully for UID: {firebase_uid}")
+            logger.debug(f"Token verified successfully for UID: {firebase_uid}")
             
-            # Get or create user in our database
+            # Resolve (or create) our user, usually without touching the database
             user = get_or_create_user(firebase_uid)
             
-            # Add user to request context
+            # Add a lightweight user handle to request context
             request.user = user
             
             return f(*args, **kwargs)
@@ -105,6 +168,7 @@ def firebase_auth_required(f):
             return jsonify({'error': 'Invalid token'}), 401
         except requests.exceptions.ConnectionError as e:
             logger.error(f"Connection error during token verification: {e}")
+            health_monitor.record_failure()
             return jsonify({
                 'error': 'Authentication service unavailable',
                 'details': 'Cannot connect to Firebase authentication servers. Please try again later.'
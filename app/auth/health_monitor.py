@@ -0,0 +1,100 @@
+import logging
+import os
+import threading
+import time
+from typing import Callable, Dict
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitState:
+    CLOSED = "closed"  # Firebase reachable, requests flow normally
+    OPEN = "open"      # Firebase unreachable, fail fast with 503
+
+
+class FirebaseHealthMonitor:
+    """
+    Background Firebase connectivity monitor with a circuit breaker.
+
+    One probe thread runs per process and is (re)started lazily, so forked
+    gunicorn/Celery workers each get their own. Request handlers only read
+    the current state, which never blocks on the network.
+    """
+
+    def __init__(self, probe: Callable[[], bool], interval: float, failure_threshold: int):
+        self.probe = probe
+        self.interval = interval
+        self.failure_threshold = failure_threshold
+        self.state = CircuitState.CLOSED
+        self.consecutive_failures = 0
+        self.last_probe_at = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._pid = None
+
+    def start(self):
+        """Start the probe thread for this process if it is not running yet"""
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            return
+
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._pid = os.getpid()
+            self._thread = threading.Thread(
+                target=self._run, name="firebase-health-monitor", daemon=True
+            )
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.probe_now()
+            self._stop.wait(self.interval)
+
+    def probe_now(self) -> bool:
+        """Run a single probe and update the breaker"""
+        try:
+            healthy = self.probe()
+        except Exception as e:
+            logger.error(f"Firebase health probe raised: {e}")
+            healthy = False
+
+        self.last_probe_at = time.time()
+        if healthy:
+            self.record_success()
+        else:
+            self.record_failure()
+        return healthy
+
+    def record_success(self):
+        with self._lock:
+            if self.state == CircuitState.OPEN:
+                logger.info("Firebase reachable again, closing circuit")
+            self.consecutive_failures = 0
+            self.state = CircuitState.CLOSED
+
+    def record_failure(self):
+        with self._lock:
+            self.consecutive_failures += 1
+            if self.state == CircuitState.CLOSED and self.consecutive_failures >= self.failure_threshold:
+                logger.error(
+                    f"Firebase unreachable after {self.consecutive_failures} failures, opening circuit"
+                )
+                self.state = CircuitState.OPEN
+
+    def is_available(self) -> bool:
+        """O(1) check used on the request path"""
+        self.start()
+        return self.state != CircuitState.OPEN
+
+    def status(self) -> Dict:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "last_probe_at": self.last_probe_at
+        }
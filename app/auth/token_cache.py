@@ -0,0 +1,105 @@
+import hashlib
+import math
+import threading
+import time
+from typing import Dict, Optional
+from app.config import config
+from app.extensions import get_redis_client
+from app.utils.cache import TieredCache
+
+# Tokens are treated as expired slightly early to absorb clock skew
+EXPIRY_LEEWAY_SECONDS = 5
+
+# Firebase ID tokens live for at most an hour, so revocation markers never need to outlive that
+REVOCATION_MARKER_TTL = 3600
+
+
+class VerifiedTokenCache:
+    """
+    Caches decoded Firebase ID token claims until the token's own `exp`.
+
+    Entries are keyed by a SHA-256 of the raw token so tokens are never stored.
+    Each entry lives for min(exp - now, AUTH_TOKEN_CACHE_MAX_TTL), which also
+    bounds how long a revocation can go unnoticed when FIREBASE_CHECK_REVOKED
+    is enabled. Revocations made through `invalidate_user` take effect at once.
+    """
+
+    def __init__(self, maxsize: int, max_ttl: int, use_redis: bool):
+        self.max_ttl = max_ttl
+        self.use_redis = use_redis
+        self._cache = TieredCache(
+            "auth:token",
+            maxsize=maxsize,
+            default_ttl=max_ttl,
+            redis_getter=get_redis_client if use_redis else None
+        )
+        self._revoked_at = {}  # uid -> unix timestamp
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(token: str) -> str:
+        return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+    def get(self, token: str) -> Optional[Dict]:
+        """Return cached claims for a still valid token, or None"""
+        claims = self._cache.get(self._key(token))
+        if claims is None:
+            return None
+
+        if claims.get("exp", 0) - EXPIRY_LEEWAY_SECONDS <= time.time():
+            self._cache.delete(self._key(token))
+            return None
+
+        return claims
+
+    def set(self, token: str, claims: Dict):
+        """Cache verified claims until the token expires"""
+        ttl = min(claims.get("exp", 0) - EXPIRY_LEEWAY_SECONDS - time.time(), self.max_ttl)
+        if ttl > 0:
+            self._cache.set(self._key(token), claims, ttl=ttl)
+
+    def discard(self, token: str):
+        self._cache.delete(self._key(token))
+
+    def invalidate_user(self, uid: str):
+        """Reject every cached token for this user issued before now"""
+        revoked_at = math.ceil(time.time())
+        with self._lock:
+            # Markers older than the longest token lifetime can no longer match anything
+            cutoff = revoked_at - REVOCATION_MARKER_TTL
+            self._revoked_at = {u: t for u, t in self._revoked_at.items() if t > cutoff}
+            self._revoked_at[uid] = revoked_at
+
+        client = get_redis_client() if self.use_redis else None
+        if client is not None:
+            try:
+                client.set(f"techtive:auth:revoked:{uid}", revoked_at, ex=REVOCATION_MARKER_TTL)
+            except Exception as e:
+                print(f"WARNING: Failed to publish token revocation for {uid}: {e}")
+
+    def is_revoked(self, claims: Dict) -> bool:
+        """Check cached claims against revocations recorded by `invalidate_user`"""
+        uid = claims.get("uid")
+        issued_at = claims.get("iat", 0)
+
+        revoked_at = self._revoked_at.get(uid)
+        if revoked_at is None and self.use_redis:
+            client = get_redis_client()
+            if client is not None:
+                try:
+                    raw = client.get(f"techtive:auth:revoked:{uid}")
+                    revoked_at = int(raw) if raw is not None else None
+                except Exception as e:
+                    print(f"WARNING: Failed to read token revocation for {uid}: {e}")
+
+        return revoked_at is not None and issued_at < revoked_at
+
+    def stats(self) -> Dict:
+        return self._cache.stats()
+
+
+token_cache = VerifiedTokenCache(
+    maxsize=config.AUTH_TOKEN_CACHE_SIZE,
+    max_ttl=config.AUTH_TOKEN_CACHE_MAX_TTL,
+    use_redis=config.AUTH_TOKEN_CACHE_REDIS
+)
@@ -0,0 +1,247 @@
+import json
+import logging
+import os
+import re
+import threading
+import time
+from typing import Dict, Optional
+import jwt
+import requests
+from cryptography import x509
+from firebase_admin import auth
+
+logger = logging.getLogger(__name__)
+
+FIREBASE_ISSUER_PREFIX = "https://securetoken.google.com/"
+
+# Used when Google omits Cache-Control (it normally sends several hours)
+DEFAULT_KEYS_MAX_AGE = 3600
+
+# Start refreshing this long before the key set expires
+KEYS_REFRESH_MARGIN = 300
+
+# Don't refetch more often than this when an unknown `kid` shows up
+MIN_FORCED_REFRESH_INTERVAL = 60
+
+# Backoff between failed fetches: doubles from the base up to the cap
+FETCH_FAILURE_BACKOFF = 1
+MAX_FETCH_FAILURE_BACKOFF = 60
+
+CLOCK_SKEW_SECONDS = 5
+
+
+def _load_public_keys(certs: Dict[str, str]) -> Dict:
+    """Turn a {kid: PEM x509 certificate} mapping into {kid: public key}"""
+    return {
+        kid: x509.load_pem_x509_certificate(pem.encode("utf-8")).public_key()
+        for kid, pem in certs.items()
+    }
+
+
+def _parse_max_age(cache_control: Optional[str]) -> int:
+    match = re.search(r"max-age=(\d+)", cache_control or "")
+    return int(match.group(1)) if match else DEFAULT_KEYS_MAX_AGE
+
+
+class FileKeySet:
+    """
+    Signing keys loaded from a local JSON file in Google's x509 format.
+
+    Lets tests and local development verify tokens minted with a stand-in key pair.
+    The file is re-read whenever its modification time changes.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._keys = {}
+        self._mtime = None
+        self._lock = threading.Lock()
+
+    def get_key(self, kid: str):
+        mtime = os.path.getmtime(self.path)
+        if mtime != self._mtime:
+            with self._lock:
+                if mtime != self._mtime:
+                    with open(self.path) as f:
+                        self._keys = _load_public_keys(json.load(f))
+                    self._mtime = mtime
+        return self._keys.get(kid)
+
+
+class GoogleCertKeySet:
+    """
+    Google's published Firebase signing certificates, cached per process.
+
+    Honors the response's Cache-Control max-age and refreshes in a background
+    thread shortly before expiry, so requests keep verifying against the
+    current keys while new ones download. Refreshes are single-flight: at
+    most one fetch runs at a time and concurrent callers wait for it and
+    share its outcome, success or failure. Failed fetches back off
+    exponentially so an unreachable endpoint isn't hammered.
+    """
+
+    def __init__(self, url: str, timeout: float = 10):
+        self.url = url
+        self.timeout = timeout
+        self._keys = {}
+        self._expires_at = 0.0
+        self._last_fetch_at = 0.0
+        self._last_attempt_at = 0.0
+        self._last_attempt_ok = False
+        self._failures = 0
+        self._retry_at = 0.0
+        self._refresh_lock = threading.Lock()
+
+    def _fetch(self):
+        response = requests.get(self.url, timeout=self.timeout)
+        response.raise_for_status()
+        keys = _load_public_keys(response.json())
+        self._keys = keys
+        self._expires_at = time.time() + _parse_max_age(response.headers.get("Cache-Control"))
+        self._last_fetch_at = time.time()
+        logger.info(f"Loaded {len(keys)} Firebase signing keys")
+
+    def refresh(self, blocking: bool = True) -> bool:
+        """Fetch the key set unless another refresh is already in flight"""
+        requested_at = time.time()
+        if not self._refresh_lock.acquire(blocking=blocking):
+            return False
+        try:
+            # Another caller finished a fetch while we waited for the lock: reuse its outcome
+            if self._last_attempt_at >= requested_at:
+                return self._last_attempt_ok
+            if time.time() < self._retry_at:
+                return False
+            try:
+                self._fetch()
+            except Exception as e:
+                self._failures += 1
+                backoff = min(FETCH_FAILURE_BACKOFF * 2 ** (self._failures - 1), MAX_FETCH_FAILURE_BACKOFF)
+                self._retry_at = time.time() + backoff
+                self._last_attempt_ok = False
+                logger.error(f"Failed to refresh Firebase signing keys (retrying in {backoff}s): {e}")
+            else:
+                self._failures = 0
+                self._retry_at = 0.0
+                self._last_attempt_ok = True
+            self._last_attempt_at = time.time()
+            return self._last_attempt_ok
+        finally:
+            self._refresh_lock.release()
+
+    def _refresh_in_background(self):
+        if self._refresh_lock.locked():
+            return
+        threading.Thread(
+            target=self.refresh, kwargs={"blocking": False},
+            name="firebase-keys-refresh", daemon=True
+        ).start()
+
+    def get_key(self, kid: str):
+        now = time.time()
+
+        if not self._keys:
+            # Cold start: every caller waits on the same single fetch
+            self.refresh()
+        elif now >= self._expires_at - KEYS_REFRESH_MARGIN:
+            self._refresh_in_background()
+
+        key = self._keys.get(kid)
+        if key is None and self._last_attempt_at < now - MIN_FORCED_REFRESH_INTERVAL:
+            # Keys rotated ahead of schedule
+            self.refresh()
+            key = self._keys.get(kid)
+        return key
+
+
+class FirebaseAdminVerifier:
+    """Verifies tokens through the Firebase Admin SDK"""
+
+    requires_network = True
+
+    def __init__(self, check_revoked: bool = False):
+        self.check_revoked = check_revoked
+
+    def verify(self, token: str) -> Dict:
+        return auth.verify_id_token(token, check_revoked=self.check_revoked)
+
+
+class LocalTokenVerifier:
+    """
+    Verifies Firebase ID tokens locally against cached signing keys.
+
+    Performs the same checks as the Admin SDK (RS256 signature, audience,
+    issuer, expiry, subject) using CPU only. Revocation cannot be checked
+    offline; use `revoke_user_tokens` so the token cache rejects them.
+    """
+
+    requires_network = False
+
+    def __init__(self, key_set, project_id: str):
+        if not project_id:
+            raise ValueError("A Firebase project ID is required for local token verification")
+        self.key_set = key_set
+        self.project_id = project_id
+        self.issuer = FIREBASE_ISSUER_PREFIX + project_id
+
+    def verify(self, token: str) -> Dict:
+        try:
+            header = jwt.get_unverified_header(token)
+        except jwt.InvalidTokenError as e:
+            raise auth.InvalidIdTokenError(f"Malformed Firebase ID token: {e}", cause=e)
+
+        if header.get("alg") != "RS256":
+            raise auth.InvalidIdTokenError("Firebase ID token has incorrect algorithm")
+
+        if not header.get("kid"):
+            raise auth.InvalidIdTokenError("Firebase ID token has no key ID")
+
+        key = self.key_set.get_key(header.get("kid"))
+        if key is None:
+            raise auth.InvalidIdTokenError("Firebase ID token has an unknown key ID")
+
+        try:
+            claims = jwt.decode(
+                token,
+                key,
+                algorithms=["RS256"],
+                audience=self.project_id,
+                issuer=self.issuer,
+                leeway=CLOCK_SKEW_SECONDS,
+                options={"require": ["exp", "iat", "sub", "aud", "iss"]}
+            )
+        except jwt.ExpiredSignatureError as e:
+            raise auth.ExpiredIdTokenError("The Firebase ID token has expired.", e)
+        except jwt.InvalidTokenError as e:
+            raise auth.InvalidIdTokenError(f"Invalid Firebase ID token: {e}", cause=e)
+
+        subject = claims.get("sub")
+        if not isinstance(subject, str) or not subject or len(subject) > 128:
+            raise auth.InvalidIdTokenError("Firebase ID token has an invalid subject")
+
+        if claims.get("auth_time", 0) > time.time() + CLOCK_SKEW_SECONDS:
+            raise auth.InvalidIdTokenError("Firebase ID token has an auth_time in the future")
+
+        claims["uid"] = subject
+        return claims
+
+
+def create_token_verifier(config):
+    """Build the verifier selected by FIREBASE_TOKEN_VERIFIER"""
+    if config.FIREBASE_TOKEN_VERIFIER == "local":
+        if config.FIREBASE_SIGNING_KEYS_FILE:
+            key_set = FileKeySet(config.FIREBASE_SIGNING_KEYS_FILE)
+        else:
+            key_set = GoogleCertKeySet(config.FIREBASE_SIGNING_KEYS_URL)
+
+        project_id = config.FIREBASE_PROJECT_ID
+        if not project_id:
+            import firebase_admin
+            project_id = firebase_admin.get_app().project_id
+
+        return LocalTokenVerifier(key_set, project_id)
+
+    if config.FIREBASE_TOKEN_VERIFIER != "firebase_admin":
+        raise ValueError(f"Unknown FIREBASE_TOKEN_VERIFIER: {config.FIREBASE_TOKEN_VERIFIER}")
+
+    return FirebaseAdminVerifier(check_revoked=config.FIREBASE_CHECK_REVOKED)
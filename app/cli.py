@@ -0,0 +1,232 @@
+"""
+Flask CLI commands (run with `flask <command>`).
+"""
+
+import json
+import os
+import click
+from flask import Flask
+from flask.cli import with_appcontext
+
+
+@click.command("check-query-plans")
+@click.option("--users", default=200, show_default=True, help="Number of seeded users")
+@click.option("--notes-per-user", default=60, show_default=True, help="Notes seeded per user")
+@with_appcontext
+def check_query_plans_command(users, notes_per_user):
+    """Fail if a hot per-user query plans a sequential scan or a note write endpoint's statement count grows with its input (rolled back afterwards)"""
+    from app.devtools.query_plans import check_query_plans
+
+    failures = check_query_plans(users=users, notes_per_user=notes_per_user)
+    if failures:
+        for failure in failures:
+            click.echo(f"FAIL {failure}", err=True)
+        raise SystemExit(1)
+    click.echo("All hot query plans use indexes and write statement counts are fixed")
+
+
+@click.command("emotion-benchmark")
+@click.argument("samples_path", type=click.Path(exists=True, dir_okay=False))
+@click.option("--limit", type=int, default=None, help="Only use the first N samples")
+@click.option("--window", type=int, default=None, help="Window size in tokens (default: EMOTION_WINDOW_TOKENS)")
+@click.option("--overlap", type=int, default=None, help="Window overlap in tokens (default: EMOTION_WINDOW_OVERLAP)")
+@with_appcontext
+def emotion_benchmark_command(samples_path, limit, window, overlap):
+    """Compare single-pass and windowed emotion scoring on a JSONL file of notes"""
+    from app.config import config
+    from app.utils.emotion_backends import ChunkingEmotionBackend, create_base_emotion_backend
+    from app.utils.emotion_benchmark import compare_backends, load_samples
+
+    samples = load_samples(samples_path, limit)
+    backend = create_base_emotion_backend()
+    chunked = ChunkingEmotionBackend(
+        backend,
+        config.EMOTION_MODEL_PATH,
+        window_tokens=window or config.EMOTION_WINDOW_TOKENS,
+        overlap_tokens=overlap or config.EMOTION_WINDOW_OVERLAP
+    )
+
+    results = compare_backends({"single_pass": backend, "windowed": chunked}, samples)
+    click.echo(json.dumps(results, indent=2))
+
+
+@click.command("emotion-runtime-benchmark")
+@click.argument("samples_path", type=click.Path(exists=True, dir_okay=False))
+@click.option("--limit", type=int, default=None, help="Only use the first N samples")
+@click.option("--runtimes", default="torch,int8,onnx", show_default=True, help="Comma separated local runtimes; the first is the baseline")
+@click.option("--threads", type=int, default=None, help="Intra-op threads per run (default: EMOTION_INTRA_OP_THREADS)")
+@click.option("--timeout", type=float, default=3600, show_default=True, help="Seconds before a runtime's run is abandoned")
+@with_appcontext
+def emotion_runtime_benchmark_command(samples_path, limit, runtimes, threads, timeout):
+    """Compare notes/sec, p99 latency and RSS of the local emotion model across CPU runtimes"""
+    from app.config import config
+    from app.utils.emotion_benchmark import compare_runtimes, load_samples
+
+    results = compare_runtimes(
+        [runtime.strip() for runtime in runtimes.split(",") if runtime.strip()],
+        load_samples(samples_path, limit),
+        timeout=timeout,
+        model_path=config.EMOTION_MODEL_PATH,
+        batch_size=config.EMOTION_BATCH_SIZE,
+        max_length=config.EMOTION_MAX_LENGTH,
+        num_threads=threads or config.EMOTION_INTRA_OP_THREADS,
+        onnx_path=config.EMOTION_ONNX_PATH
+    )
+    click.echo(json.dumps(results, indent=2))
+
+
+@click.command("emotion-server")
+@click.option("--host", default="127.0.0.1", show_default=True, help="Interface to bind (keep it local)")
+@click.option("--port", default=8765, show_default=True, help="Port to listen on")
+@click.option("--max-batch-size", type=int, default=None, help="Texts per model call (default: EMOTION_SERVER_MAX_BATCH_SIZE)")
+@click.option("--max-wait-ms", type=float, default=None, help="Longest wait for a batch to fill (default: EMOTION_SERVER_MAX_WAIT_MS)")
+@with_appcontext
+def emotion_server_command(host, port, max_batch_size, max_wait_ms):
+    """Serve the local emotion model to every worker on this host, batching concurrent requests"""
+    from app.config import config
+    from app.utils.emotion_backends import create_base_emotion_backend
+    from app.utils.emotion_server import create_server
+
+    backend = create_base_emotion_backend("local")
+    backend.load()
+
+    server = create_server(
+        backend,
+        host,
+        port,
+        max_batch_size=max_batch_size or config.EMOTION_SERVER_MAX_BATCH_SIZE,
+        max_wait=(max_wait_ms if max_wait_ms is not None else config.EMOTION_SERVER_MAX_WAIT_MS) / 1000
+    )
+    click.echo(f"Emotion server for {backend.model_id} listening on http://{host}:{port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+@click.command("llm-cache-check")
+@with_appcontext
+def llm_cache_check_command():
+    """Check the LLM response cache against a local fake completion server"""
+    import uuid
+    from app.config import config
+    from app.utils import http_clients
+    from app.utils.api_utils import chat_completion
+    from app.utils.fake_openai import FakeCompletionServer
+
+    with FakeCompletionServer() as fake:
+        config.OPENAI_BASE_URL = fake.url
+        config.OPENAI_API_KEY = config.OPENAI_API_KEY or "fake-key"
+        config.LLM_CACHE_ENABLED = True
+        http_clients._clients.pop("openai", None)
+
+        # A fresh prompt per run, so entries cached by earlier runs can't hide a miss
+        messages = [{"role": "user", "content": f"llm-cache-check {uuid.uuid4().hex}"}]
+        first = chat_completion(messages, max_tokens=50, temperature=0.7)
+        retried = chat_completion(messages, max_tokens=50, temperature=0.7)
+        other = chat_completion(messages, max_tokens=50, temperature=0.2)
+        first_attempt = chat_completion(messages, max_tokens=50, temperature=0.7, cache_scope="attempt-1")
+        retried_attempt = chat_completion(messages, max_tokens=50, temperature=0.7, cache_scope="attempt-1")
+        next_attempt = chat_completion(messages, max_tokens=50, temperature=0.7, cache_scope="attempt-2")
+
+        failures = []
+        if first != retried:
+            failures.append("identical request returned a different completion")
+        if other == first:
+            failures.append("a different temperature was served from the cache")
+        if first_attempt != retried_attempt:
+            failures.append("a retry of the same attempt returned a different completion")
+        if next_attempt in (first, first_attempt):
+            failures.append("a new attempt was served another attempt's completion")
+        if fake.calls != 4:
+            failures.append(f"expected 4 upstream calls, got {fake.calls}")
+
+    if failures:
+        for failure in failures:
+            click.echo(f"FAIL {failure}", err=True)
+        raise SystemExit(1)
+    click.echo("LLM response cache reuses identical requests and keys on sampling parameters")
+
+
+@click.command("prompt-budget-check")
+@click.option("--trials", default=500, show_default=True, help="Random contexts to build prompts for")
+@click.option("--seed", default=0, show_default=True, help="Random seed")
+@with_appcontext
+def prompt_budget_check_command(trials, seed):
+    """Fail if an advice or memory summary prompt ever exceeds its token budget"""
+    import random
+    from types import SimpleNamespace
+    from app.config import config
+    from app.utils.api_utils import build_advice_prompt, build_memory_summary_prompt
+    from app.utils.emotion_scores import EMOTION_ORDER
+    from app.utils.prompt_budget import get_token_counter
+
+    rng = random.Random(seed)
+    words = "I felt anxious about work today but dinner with friends helped a lot, très bien 😊 and then".split()
+    counter = get_token_counter()
+
+    def text():
+        return " ".join(rng.choices(words, k=rng.choice([0, 5, 40, 300, 3000])))
+
+    def note():
+        return SimpleNamespace(content=text() or "x", **{f"{e}_value": rng.random() for e in EMOTION_ORDER})
+
+    failures = []
+    for trial in range(trials):
+        config.ADVICE_PROMPT_TOKEN_BUDGET = rng.randint(60, 2000)
+        config.MEMORY_SUMMARY_PROMPT_TOKEN_BUDGET = rng.randint(60, 1000)
+        context = {
+            "memories": [
+                SimpleNamespace(summary=text(), dominant_emotion="joy", emotional_intensity=rng.random())
+                for _ in range(rng.randint(0, 5))
+            ],
+            "recent_notes": [note() for _ in range(rng.randint(1, 3))],
+            "dominant_current_emotion": "neutral"
+        }
+
+        for name, prompt, budget in (
+            ("advice", build_advice_prompt(context), config.ADVICE_PROMPT_TOKEN_BUDGET),
+            ("memory summary", build_memory_summary_prompt([note() for _ in range(3)]), config.MEMORY_SUMMARY_PROMPT_TOKEN_BUDGET),
+        ):
+            tokens = counter.count(prompt)
+            if tokens > budget:
+                failures.append(f"trial {trial}: {name} prompt has {tokens} tokens, budget {budget}")
+
+    if failures:
+        for failure in failures:
+            click.echo(f"FAIL {failure}", err=True)
+        raise SystemExit(1)
+    click.echo(f"All {trials * 2} prompts fit their token budgets")
+
+
+@click.command("prompt-tokenizer-download")
+@click.option("--name", default="gpt2", show_default=True, help="Hugging Face Hub tokenizer to download")
+@click.option("--output", type=click.Path(dir_okay=False), default=None, help="Where to save tokenizer.json (default: PROMPT_TOKENIZER)")
+@with_appcontext
+def prompt_tokenizer_download_command(name, output):
+    """Download a prompt tokenizer once (e.g. at image build) so PROMPT_TOKENIZER points at a local file"""
+    from tokenizers import Tokenizer
+    from app.config import config
+
+    output = output or config.PROMPT_TOKENIZER
+    if not output:
+        click.echo("FAIL Pass --output or set PROMPT_TOKENIZER", err=True)
+        raise SystemExit(1)
+
+    directory = os.path.dirname(output)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    Tokenizer.from_pretrained(name).save(output)
+    click.echo(f"Saved {name} tokenizer to {output}")
+
+
+def register_commands(app: Flask):
+    app.cli.add_command(check_query_plans_command)
+    app.cli.add_command(emotion_benchmark_command)
+    app.cli.add_command(emotion_runtime_benchmark_command)
+    app.cli.add_command(emotion_server_command)
+    app.cli.add_command(llm_cache_check_command)
+    app.cli.add_command(prompt_budget_check_command)
+    app.cli.add_command(prompt_tokenizer_download_command)
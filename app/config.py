@@ -11,16 +11,129 @@ class Config:
     SQLALCHEMY_DATABASE_URI = os.environ.get("DATABASE_URL")
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     
+    # Note list pagination / streaming
+    NOTES_PAGE_DEFAULT_LIMIT = int(os.environ.get("NOTES_PAGE_DEFAULT_LIMIT", "50"))
+    NOTES_PAGE_MAX_LIMIT = int(os.environ.get("NOTES_PAGE_MAX_LIMIT", "200"))
+    NOTES_STREAM_BATCH_SIZE = int(os.environ.get("NOTES_STREAM_BATCH_SIZE", "500"))
+
+    # Seconds to wait after a note edit before analyzing it (edits in between supersede it)
+    EMOTION_DEBOUNCE_SECONDS = int(os.environ.get("EMOTION_DEBOUNCE_SECONDS", "10"))
+
+    # Bulk note import
+    NOTES_BATCH_MAX_SIZE = int(os.environ.get("NOTES_BATCH_MAX_SIZE", "10000"))
+    EMOTION_BATCH_CHUNK_SIZE = int(os.environ.get("EMOTION_BATCH_CHUNK_SIZE", "100"))
+
     # Celery Configuration
     CELERY_BROKER_URL = os.environ.get("CELERY_BROKER_URL", "redis://localhost:6379")
     CELERY_RESULT_BACKEND = os.environ.get("CELERY_RESULT_BACKEND", "redis://localhost:6379")
 
+    # Worker children are recycled after this many tasks / this much resident memory (KiB); 0 disables
+    CELERY_MAX_TASKS_PER_CHILD = int(os.environ.get("CELERY_MAX_TASKS_PER_CHILD", "1000")) or None
+    CELERY_MAX_MEMORY_PER_CHILD = int(os.environ.get("CELERY_MAX_MEMORY_PER_CHILD", str(1536 * 1024))) or None
+    # Load the emotion model when a worker child starts instead of on its first task
+    WORKER_WARM_EMOTION_BACKEND = os.environ.get("WORKER_WARM_EMOTION_BACKEND", "true").lower() == "true"
+    # Log tracemalloc top allocations when one task grows RSS by more than this many MB
+    WORKER_TRACEMALLOC_ENABLED = os.environ.get("WORKER_TRACEMALLOC_ENABLED", "false").lower() == "true"
+    WORKER_TRACEMALLOC_THRESHOLD_MB = float(os.environ.get("WORKER_TRACEMALLOC_THRESHOLD_MB", "50"))
+
+    # Redis used for shared caches (defaults to the Celery broker)
+    REDIS_URL = os.environ.get("REDIS_URL", CELERY_BROKER_URL)
+    REDIS_SOCKET_TIMEOUT = float(os.environ.get("REDIS_SOCKET_TIMEOUT", "0.5"))
+
+    # Verified Firebase token cache
+    AUTH_TOKEN_CACHE_SIZE = int(os.environ.get("AUTH_TOKEN_CACHE_SIZE", "10000"))
+    AUTH_TOKEN_CACHE_MAX_TTL = int(os.environ.get("AUTH_TOKEN_CACHE_MAX_TTL", "300"))
+    AUTH_TOKEN_CACHE_REDIS = os.environ.get("AUTH_TOKEN_CACHE_REDIS", "false").lower() == "true"
+    AUTH_IDENTITY_CACHE_SIZE = int(os.environ.get("AUTH_IDENTITY_CACHE_SIZE", "10000"))
+    AUTH_IDENTITY_CACHE_TTL = int(os.environ.get("AUTH_IDENTITY_CACHE_TTL", "3600"))
+    FIREBASE_CHECK_REVOKED = os.environ.get("FIREBASE_CHECK_REVOKED", "false").lower() == "true"
+
+    # Firebase ID token verification: "firebase_admin" (SDK) or "local" (offline JWT check)
+    FIREBASE_TOKEN_VERIFIER = os.environ.get("FIREBASE_TOKEN_VERIFIER", "firebase_admin")
+    FIREBASE_PROJECT_ID = os.environ.get("FIREBASE_PROJECT_ID")
+    FIREBASE_SIGNING_KEYS_URL = os.environ.get("FIREBASE_SIGNING_KEYS_URL", "https://www.googleapis.com/robot/v1/metadata/x509/securetoken@system.gserviceaccount.com")
+    FIREBASE_SIGNING_KEYS_FILE = os.environ.get("FIREBASE_SIGNING_KEYS_FILE")
+
+    # Background Firebase connectivity monitor
+    FIREBASE_HEALTH_PROBE_URL = os.environ.get("FIREBASE_HEALTH_PROBE_URL", "https://www.googleapis.com/identitytoolkit/v3/relyingparty/publicKeys")
+    FIREBASE_HEALTH_PROBE_INTERVAL = float(os.environ.get("FIREBASE_HEALTH_PROBE_INTERVAL", "30"))
+    FIREBASE_HEALTH_PROBE_TIMEOUT = float(os.environ.get("FIREBASE_HEALTH_PROBE_TIMEOUT", "5"))
+    FIREBASE_HEALTH_FAILURE_THRESHOLD = int(os.environ.get("FIREBASE_HEALTH_FAILURE_THRESHOLD", "2"))
+
     # Hugging Face API
     HUGGING_FACE_API_TOKEN = os.environ.get("HUGGING_FACE_API_TOKEN")
     HUGGING_FACE_MODEL_URL = os.environ.get("HUGGING_FACE_MODEL_URL", "https://api-inference.huggingface.co/models/j-hartmann/emotion-english-distilroberta-base")
+    HF_POOL_SIZE = int(os.environ.get("HF_POOL_SIZE", "10"))
+    HF_READ_TIMEOUT = float(os.environ.get("HF_READ_TIMEOUT", "30"))
+
+    # Emotion classifier: "hf_api" (hosted Inference API), "local" (in-process transformers)
+    # or "server" (shared local inference server, see `flask emotion-server`)
+    EMOTION_BACKEND = os.environ.get("EMOTION_BACKEND", "hf_api")
+    EMOTION_MODEL_PATH = os.environ.get("EMOTION_MODEL_PATH", "j-hartmann/emotion-english-distilroberta-base")
+    EMOTION_BATCH_SIZE = int(os.environ.get("EMOTION_BATCH_SIZE", "16"))
+    EMOTION_MAX_LENGTH = int(os.environ.get("EMOTION_MAX_LENGTH", "512"))
+    # Local CPU runtime: "torch" (fp32), "int8" (dynamic quantization) or "onnx" (requires onnxruntime)
+    EMOTION_RUNTIME = os.environ.get("EMOTION_RUNTIME", "torch")
+    EMOTION_INTRA_OP_THREADS = int(os.environ.get("EMOTION_INTRA_OP_THREADS", "0")) or None
+    EMOTION_ONNX_PATH = os.environ.get("EMOTION_ONNX_PATH")
+
+    # Shared inference server: one model copy per host, requests batched dynamically
+    EMOTION_SERVER_URL = os.environ.get("EMOTION_SERVER_URL", "http://127.0.0.1:8765")
+    EMOTION_SERVER_TIMEOUT = float(os.environ.get("EMOTION_SERVER_TIMEOUT", "30"))
+    EMOTION_SERVER_MAX_BATCH_SIZE = int(os.environ.get("EMOTION_SERVER_MAX_BATCH_SIZE", "32"))
+    EMOTION_SERVER_MAX_WAIT_MS = float(os.environ.get("EMOTION_SERVER_MAX_WAIT_MS", "10"))
+
+    # Long notes are scored as overlapping token windows (model limit is 512 tokens incl. special tokens)
+    EMOTION_CHUNKING_ENABLED = os.environ.get("EMOTION_CHUNKING_ENABLED", "false").lower() == "true"
+    EMOTION_WINDOW_TOKENS = int(os.environ.get("EMOTION_WINDOW_TOKENS", "510"))
+    EMOTION_WINDOW_OVERLAP = int(os.environ.get("EMOTION_WINDOW_OVERLAP", "64"))
+
+    # Emotion score cache keyed by normalized content + model
+    EMOTION_CACHE_ENABLED = os.environ.get("EMOTION_CACHE_ENABLED", "true").lower() == "true"
+    EMOTION_CACHE_SIZE = int(os.environ.get("EMOTION_CACHE_SIZE", "10000"))
+    EMOTION_CACHE_TTL = int(os.environ.get("EMOTION_CACHE_TTL", str(7 * 24 * 3600)))
+    EMOTION_CACHE_REDIS = os.environ.get("EMOTION_CACHE_REDIS", "true").lower() == "true"
+
+    # Micro-batching of concurrent send_note tasks (requires Redis)
+    EMOTION_MICRO_BATCHING = os.environ.get("EMOTION_MICRO_BATCHING", "false").lower() == "true"
+    EMOTION_MICRO_BATCH_WINDOW = float(os.environ.get("EMOTION_MICRO_BATCH_WINDOW", "0.2"))
+    EMOTION_MICRO_BATCH_SIZE = int(os.environ.get("EMOTION_MICRO_BATCH_SIZE", "32"))
+    EMOTION_MICRO_BATCH_TIMEOUT = float(os.environ.get("EMOTION_MICRO_BATCH_TIMEOUT", "60"))
 
     # OPEN AI API
     OPENAI_API_KEY = os.environ.get("OPENAI_API_KEY")
+    OPENAI_BASE_URL = os.environ.get("OPENAI_BASE_URL", "https://api.openai.com/v1")
+    OPENAI_POOL_SIZE = int(os.environ.get("OPENAI_POOL_SIZE", "10"))
+    OPENAI_READ_TIMEOUT = float(os.environ.get("OPENAI_READ_TIMEOUT", "30"))
+    OPENAI_MODEL = os.environ.get("OPENAI_MODEL", "gpt-3.5-turbo")
+
+    # Cache of OpenAI completions keyed by model, messages, temperature and max_tokens.
+    # Only meant to absorb retries and duplicate triggers, so entries live as long as
+    # the advice idempotency window (ADVICE_IDEMPOTENCY_TTL) by default
+    LLM_CACHE_ENABLED = os.environ.get("LLM_CACHE_ENABLED", "true").lower() == "true"
+    LLM_CACHE_SIZE = int(os.environ.get("LLM_CACHE_SIZE", "1000"))
+    LLM_CACHE_TTL = int(os.environ.get("LLM_CACHE_TTL", os.environ.get("ADVICE_IDEMPOTENCY_TTL", "3600")))
+
+    # Prompt token budgets (user prompt only); counted with a local `tokenizers` tokenizer.json,
+    # by default the GPT-2 tokenizer shipped in app/resources (another one can be fetched
+    # with `flask prompt-tokenizer-download`; empty: estimated)
+    ADVICE_PROMPT_TOKEN_BUDGET = int(os.environ.get("ADVICE_PROMPT_TOKEN_BUDGET", "1200"))
+    MEMORY_SUMMARY_PROMPT_TOKEN_BUDGET = int(os.environ.get("MEMORY_SUMMARY_PROMPT_TOKEN_BUDGET", "800"))
+    PROMPT_TOKENIZER = os.environ.get(
+        "PROMPT_TOKENIZER", os.path.join(os.path.dirname(__file__), "resources", "gpt2-tokenizer.json")
+    )
+    PROMPT_TOKEN_CACHE_SIZE = int(os.environ.get("PROMPT_TOKEN_CACHE_SIZE", "10000"))
+    PROMPT_MIN_ITEM_TOKENS = int(os.environ.get("PROMPT_MIN_ITEM_TOKENS", "16"))
+
+    # Outbound HTTP (Hugging Face / OpenAI): connect timeout and retries on 429/5xx with jittered backoff
+    HTTP_CONNECT_TIMEOUT = float(os.environ.get("HTTP_CONNECT_TIMEOUT", "3.05"))
+    HTTP_MAX_RETRIES = int(os.environ.get("HTTP_MAX_RETRIES", "2"))
+    HTTP_BACKOFF_BASE = float(os.environ.get("HTTP_BACKOFF_BASE", "0.5"))
+    HTTP_BACKOFF_MAX = float(os.environ.get("HTTP_BACKOFF_MAX", "8"))
+
+    # One advice generation per user at a time; duplicate triggers attach to the running task
+    ADVICE_LOCK_LEASE_SECONDS = int(os.environ.get("ADVICE_LOCK_LEASE_SECONDS", "600"))
+    ADVICE_IDEMPOTENCY_TTL = int(os.environ.get("ADVICE_IDEMPOTENCY_TTL", "3600"))
 
     # AWS S3 Configuration
     AWS_ACCESS_KEY_ID = os.environ.get('AWS_ACCESS_KEY_ID')
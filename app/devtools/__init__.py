@@ -0,0 +1 @@
+# Development-only checks run through the Flask CLI; never imported by the web app or workers
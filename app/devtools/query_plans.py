@@ -0,0 +1,257 @@
+import random
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, List, Optional, Tuple
+from unittest import mock
+from flask import current_app, request
+from sqlalchemy import event, insert, select, text
+from app.extensions import db
+from app.models.formatting import Formatting, FormattingType
+from app.models.note import Note
+from app.models.user import User
+from app.models.user_memory import UserMemory
+from app.models.weekly_advice import WeeklyAdvice
+
+# A sequential scan on any of these means a per-user query lost its index
+TIMELINE_TABLES = {"notes", "weekly_advices", "user_memories", "formatting"}
+
+# Statements each write endpoint may issue, whatever the number of notes or formattings
+WRITE_STATEMENT_BUDGETS = {
+    "POST /api/note/": 6,
+    "POST /api/notes/batch": 6,
+    "PUT /api/note/<id>/": 6,
+}
+
+# Sizes compared by the write checks: counts must not change between them
+SMALL_WRITE, LARGE_WRITE = 1, 20
+
+
+def _seed(users: int, notes_per_user: int) -> Tuple[int, int]:
+    """
+    Insert throwaway users with notes, formattings, advice and memories.
+
+    Runs inside the caller's transaction, which is always rolled back.
+    Returns the id of one seeded user and one of their notes.
+    """
+    run_id = uuid.uuid4().hex[:8]
+    user_ids = db.session.execute(
+        insert(User).returning(User.id),
+        [{"firebase_uid": f"query-plan-check-{run_id}-{i}"} for i in range(users)]
+    ).scalars().all()
+
+    now = datetime.now(timezone.utc)
+    note_rows, advice_rows, memory_rows = [], [], []
+    for user_id in user_ids:
+        for i in range(notes_per_user):
+            note_rows.append({
+                "user_id": user_id,
+                "content": f"Seeded note {i}",
+                "joy_value": random.random(),
+                "sadness_value": random.random(),
+                "created_at": now - timedelta(hours=i)
+            })
+        for i in range(notes_per_user // 3):
+            created_at = now - timedelta(hours=3 * i)
+            advice_rows.append({"user_id": user_id, "content": "Seeded advice", "created_at": created_at})
+            memory_rows.append({
+                "user_id": user_id,
+                "summary": "Seeded memory",
+                "notes_count_in_batch": 3,
+                "first_note_date": created_at,
+                "last_note_date": created_at,
+                "dominant_emotion": "joy",
+                "created_at": created_at
+            })
+
+    note_ids = db.session.execute(insert(Note).returning(Note.id), note_rows).scalars().all()
+    db.session.execute(insert(Formatting), [
+        {"note_id": note_id, "type": FormattingType.BOLD, "location": 0, "length": 4}
+        for note_id in note_ids
+    ])
+    db.session.execute(insert(WeeklyAdvice), advice_rows)
+    db.session.execute(insert(UserMemory), memory_rows)
+
+    # Fresh statistics so the planner sees the seeded distribution
+    for table in TIMELINE_TABLES | {"users"}:
+        db.session.execute(text(f"ANALYZE {table}"))
+
+    user_id = user_ids[len(user_ids) // 2]
+    note_id = db.session.execute(
+        select(Note.id).where(Note.user_id == user_id).limit(1)
+    ).scalar_one()
+    return user_id, note_id
+
+
+def _view(endpoint: str, path: str, user_id: int, method: str = "GET",
+          json: Optional[Dict] = None, **view_args) -> Callable[[], object]:
+    """Call a route view as `user_id`, skipping token verification"""
+    from app.auth.firebase_auth import UserHandle
+
+    def call():
+        # Route views are wrapped by firebase_auth_required; call the inner view directly
+        func = current_app.view_functions[endpoint].__wrapped__
+        with current_app.test_request_context(path, method=method, json=json):
+            request.user = UserHandle(id=user_id, firebase_uid="query-plan-check")
+            response = func(**view_args)
+            # Drain streamed bodies so their queries actually run
+            body = response[0] if isinstance(response, tuple) else response
+            body.get_data()
+    return call
+
+
+@contextmanager
+def _capture_statements(select_only: bool = False):
+    """Collect (statement, parameters) for everything the engine executes in the block"""
+    captured = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if not select_only or statement.lstrip().upper().startswith("SELECT"):
+            captured.append((statement, parameters))
+
+    event.listen(db.engine, "before_cursor_execute", capture)
+    try:
+        yield captured
+    finally:
+        event.remove(db.engine, "before_cursor_execute", capture)
+
+
+def _hot_queries(user_id: int, note_id: int) -> Dict[str, Callable[[], object]]:
+    """Everything whose SQL should stay on an index, keyed by a readable name"""
+    from app.utils.api_utils import should_generate_advice
+    from app.utils.memory_manager import MemoryManager
+
+    return {
+        "MemoryManager.should_create_memory": lambda: MemoryManager.should_create_memory(user_id),
+        "MemoryManager.get_notes_for_memory": lambda: MemoryManager.get_notes_for_memory(user_id),
+        "MemoryManager.get_context_for_advice": lambda: MemoryManager.get_context_for_advice(user_id),
+        "should_generate_advice": lambda: should_generate_advice(user_id),
+        "GET /api/note/": _view("notes.get_user_notes", "/api/note/", user_id),
+        "GET /api/note/?limit=": _view("notes.get_user_notes", "/api/note/?limit=20", user_id),
+        "GET /api/note/?stream=": _view("notes.get_user_notes", "/api/note/?stream=true", user_id),
+        "GET /api/note/?fields=formattings": _view(
+            "notes.get_user_notes", "/api/note/?limit=20&fields=content,formattings", user_id
+        ),
+        "GET /api/note/<id>/": _view("notes.get_note", f"/api/note/{note_id}/", user_id, note_id=note_id),
+    }
+
+
+def _note_json(i: int, formattings: int) -> Dict:
+    return {
+        "content": f"Statement count check note {i}",
+        "formattings": [{"type": "BOLD", "location": j, "length": 1} for j in range(formattings)]
+    }
+
+
+def _write_calls(user_id: int, note_id: int, size: int) -> Dict[str, Callable[[], object]]:
+    """Write endpoints fed `size` notes (batch) or formattings (create/update)"""
+    return {
+        "POST /api/note/": _view(
+            "notes.create_note", "/api/note/", user_id, method="POST", json=_note_json(0, size)
+        ),
+        "POST /api/notes/batch": _view(
+            "notes.create_notes_batch", "/api/notes/batch", user_id, method="POST",
+            json={"notes": [_note_json(i, 1) for i in range(size)]}
+        ),
+        "PUT /api/note/<id>/": _view(
+            "notes.update_note", f"/api/note/{note_id}/", user_id, method="PUT",
+            json=_note_json(size, size), note_id=note_id
+        ),
+    }
+
+
+@contextmanager
+def _writes_stay_in_transaction():
+    """
+    Let write views run inside the check's rolled-back transaction
+
+    Commits become a flush plus the expiry a real commit does, so reloads
+    after commit are still counted. Celery dispatch and Redis version bumps
+    are skipped; they issue no SQL. Patching is why this check lives in
+    app.devtools rather than next to the code it checks.
+    """
+    def commit():
+        db.session.flush()
+        db.session.expire_all()
+
+    with mock.patch.object(db.session, "commit", commit), \
+            mock.patch("app.main.routes_notes.send_note"), \
+            mock.patch("app.main.routes_notes.send_notes_batch"), \
+            mock.patch("app.main.routes_notes.start_advice_generation", return_value=(None, False)), \
+            mock.patch("app.main.routes_notes.bump_user_version"):
+        yield
+
+
+def check_write_statement_counts(user_id: int, note_id: int) -> List[str]:
+    """
+    Count the statements issued by the note write endpoints
+
+    Each endpoint must issue the same number of statements for one note or
+    formatting as for many, and no more than its budget. Runs inside the
+    caller's transaction.
+    """
+    failures = []
+    counts = {}
+    with _writes_stay_in_transaction():
+        for size in (SMALL_WRITE, LARGE_WRITE):
+            for name, call in _write_calls(user_id, note_id, size).items():
+                with _capture_statements() as captured:
+                    call()
+                counts[(name, size)] = len(captured)
+
+    for name, budget in WRITE_STATEMENT_BUDGETS.items():
+        small, large = counts[(name, SMALL_WRITE)], counts[(name, LARGE_WRITE)]
+        if small != large:
+            failures.append(
+                f"{name}: {small} statements for {SMALL_WRITE} item(s) but {large} for {LARGE_WRITE}"
+            )
+        if max(small, large) > budget:
+            failures.append(f"{name}: {max(small, large)} statements, budget is {budget}")
+    return failures
+
+
+def _sequential_scans(plan: Dict) -> List[str]:
+    found = []
+    if plan.get("Node Type") == "Seq Scan" and plan.get("Relation Name") in TIMELINE_TABLES:
+        found.append(plan["Relation Name"])
+    for child in plan.get("Plans", []):
+        found.extend(_sequential_scans(child))
+    return found
+
+
+def check_query_plans(users: int = 200, notes_per_user: int = 60) -> List[str]:
+    """
+    EXPLAIN every statement issued by the hot per-user queries on seeded data,
+    then check the write endpoints' statement counts
+
+    Returns a list of human readable failures; empty means every plan uses an
+    index and every write endpoint stays within its statement budget.
+    All seeded and written data is rolled back.
+    """
+    failures = []
+    try:
+        user_id, note_id = _seed(users, notes_per_user)
+
+        for name, call in _hot_queries(user_id, note_id).items():
+            with _capture_statements(select_only=True) as captured:
+                call()
+
+            if not captured:
+                failures.append(f"{name}: issued no SELECT statements")
+
+            connection = db.session.connection()
+            for statement, parameters in captured:
+                plan = connection.exec_driver_sql(
+                    "EXPLAIN (FORMAT JSON) " + statement, parameters
+                ).scalar()
+                scans = _sequential_scans(plan[0]["Plan"])
+                if scans:
+                    failures.append(
+                        f"{name}: sequential scan on {', '.join(sorted(set(scans)))}\n    {statement}"
+                    )
+
+        failures.extend(check_write_statement_counts(user_id, note_id))
+    finally:
+        db.session.rollback()
+
+    return failures
@@ -3,6 +3,7 @@ from flask_sqlalchemy import SQLAlchemy
 from flask_marshmallow import Marshmallow
 from flask_migrate import Migrate
 from celery import Celery, Task
+import os
 import boto3
 from botocore.exceptions import ClientError
 
@@ -68,6 +69,65 @@ def init_s3_client(app: Flask):
         s3_client = None
         return False
 
+# Shared Redis client for caches (created lazily, once per process)
+redis_client = None
+_redis_client_pid = None
+
+def get_redis_client():
+    """Get the shared Redis client, or None if Redis is not configured/reachable"""
+    global redis_client, _redis_client_pid
+    from app.config import config
+
+    if not config.REDIS_URL:
+        return None
+
+    # Forked workers must not share the parent's connection pool
+    if redis_client is not None and _redis_client_pid == os.getpid():
+        return redis_client
+
+    try:
+        import redis
+        redis_client = redis.Redis.from_url(
+            config.REDIS_URL,
+            socket_connect_timeout=config.REDIS_SOCKET_TIMEOUT,
+            socket_timeout=config.REDIS_SOCKET_TIMEOUT
+        )
+        _redis_client_pid = os.getpid()
+        return redis_client
+    except Exception as e:
+        print(f"ERROR: Failed to initialize Redis client: {e}")
+        redis_client = None
+        return None
+
+# Separate Redis client for blocking commands (BLPOP) which must outlive the shared socket timeout
+blocking_redis_client = None
+_blocking_redis_client_pid = None
+
+def get_blocking_redis_client():
+    """Get a Redis client without a read timeout, or None if Redis is not configured/reachable"""
+    global blocking_redis_client, _blocking_redis_client_pid
+    from app.config import config
+
+    if not config.REDIS_URL:
+        return None
+
+    if blocking_redis_client is not None and _blocking_redis_client_pid == os.getpid():
+        return blocking_redis_client
+
+    try:
+        import redis
+        blocking_redis_client = redis.Redis.from_url(
+            config.REDIS_URL,
+            socket_connect_timeout=config.REDIS_SOCKET_TIMEOUT,
+            socket_timeout=None
+        )
+        _blocking_redis_client_pid = os.getpid()
+        return blocking_redis_client
+    except Exception as e:
+        print(f"ERROR: Failed to initialize blocking Redis client: {e}")
+        blocking_redis_client = None
+        return None
+
 db = SQLAlchemy()
 ma = Marshmallow()
 migrate = Migrate()
\ No newline at end of file
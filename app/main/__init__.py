@@ -10,11 +10,13 @@ from .routes_quotes import quotes_bp
 from .routes_notes import notes_bp
 from .routes_advice import advice_bp
 from .routes_user import user_bp
+from .routes_emotions import emotions_bp
 
 # List of all blueprints that can be registered with the app
 blueprints = [
     quotes_bp,
     notes_bp,
     advice_bp,
-    user_bp
+    user_bp,
+    emotions_bp
 ] 
\ No newline at end of file
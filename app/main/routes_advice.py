@@ -1,15 +1,25 @@
-from flask import Blueprint, jsonify, request
+import json
+from flask import Blueprint, Response, jsonify, request, stream_with_context
 from app.models.weekly_advice import WeeklyAdvice, WeeklyAdviceSchema
 from app.extensions import db
 from app.auth.firebase_auth import firebase_auth_required
-from app.utils.api_utils import should_generate_advice
-from app.utils.tasks import generate_advice_task
+from app.utils.api_utils import (
+    should_generate_advice, build_advice_prompt, advice_messages, stream_chat_completion,
+    save_advice, ADVICE_MAX_TOKENS, ADVICE_TEMPERATURE
+)
+from app.utils.memory_manager import MemoryManager
+from app.utils.advice_trigger import (
+    start_advice_generation, claim_advice_lock, finish_advice_generation, holder_task_id
+)
+from app.utils.versioning import conditional_get
+from app.utils.user_counters import get_user_counters
 
 advice_bp = Blueprint('advice', __name__, url_prefix='/api')
 advice_schema = WeeklyAdviceSchema()
 
 @advice_bp.route("/advice/latest/", methods=["GET"])
 @firebase_auth_required
+@conditional_get
 def get_latest_advice():
     """Get the most recent advice for the authenticated user"""
     latest_advice = WeeklyAdvice.query.filter_by(user_id=request.user.id)\
@@ -47,23 +57,85 @@ def generate_advice_manually():
     """Manually trigger advice generation"""
     try:
         # Check if user has any notes
-        from app.models.note import Note
-        notes_count = Note.query.filter_by(user_id=request.user.id).count()
+        counters = get_user_counters(request.user.id)
         
-        if notes_count == 0:
+        if counters is None or counters.notes_total == 0:
             return jsonify({"error": "No notes available for advice generation"}), 400
         
-        # Generate advice asynchronously
-        task = generate_advice_task.delay(request.user.id)
+        # Generate advice asynchronously, or attach to the generation already running
+        task_id, started = start_advice_generation(request.user.id)
         
-        return jsonify({
-            "message": "Advice generation started",
-            "task_id": task.id
-        }), 202
+        response = {"message": "Advice generation started" if started else "Advice generation already in progress"}
+        # A streamed generation in progress has no task to poll
+        if task_id is not None:
+            response["task_id"] = task_id
+        return jsonify(response), 202
         
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+def _sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@advice_bp.route("/advice/stream/", methods=["GET"])
+@firebase_auth_required
+def stream_advice():
+    """
+    Generate advice and stream it as Server-Sent Events while OpenAI writes it
+    
+    Events: "token" ({"content": ...}) for each chunk, then "done" with the
+    saved advice, or "error". Uses the same context and prompt as queued
+    advice generation, and the same per-user lock.
+    """
+    user_id = request.user.id
+    counters = get_user_counters(user_id)
+    if counters is None or counters.notes_total == 0:
+        return jsonify({"error": "No notes available for advice generation"}), 400
+    
+    lock_token, holder = claim_advice_lock(user_id)
+    if lock_token is None and holder is not None:
+        response = {"message": "Advice generation already in progress"}
+        task_id = holder_task_id(holder)
+        if task_id is not None:
+            response["task_id"] = task_id
+        return jsonify(response), 409
+    
+    try:
+        context = MemoryManager.get_context_for_advice(user_id)
+        prompt = build_advice_prompt(context)
+    except Exception:
+        finish_advice_generation(user_id, lock_token)
+        raise
+    
+    def generate():
+        try:
+            parts = []
+            for chunk in stream_chat_completion(
+                advice_messages(prompt), max_tokens=ADVICE_MAX_TOKENS, temperature=ADVICE_TEMPERATURE
+            ):
+                parts.append(chunk)
+                yield _sse("token", {"content": chunk})
+            
+            advice_content = "".join(parts).strip()
+            if not advice_content:
+                raise Exception("No advice content generated")
+            
+            advice = save_advice(user_id, advice_content, context)
+            yield _sse("done", advice_schema.dump(advice))
+        except Exception as e:
+            db.session.rollback()
+            print(f"Error streaming advice for user {user_id}: {e}")
+            yield _sse("error", {"error": str(e)})
+        finally:
+            # Also runs when the client disconnects mid-stream
+            finish_advice_generation(user_id, lock_token)
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @advice_bp.route("/advice/check/", methods=["GET"])
 @firebase_auth_required
 def check_advice_eligibility():
@@ -0,0 +1,51 @@
+from datetime import date
+from flask import Blueprint, jsonify, request
+from app.auth.firebase_auth import firebase_auth_required
+from app.utils.emotion_rollups import GRANULARITIES, load_rollups, resampled_trend_series, trend_series
+from app.utils.versioning import conditional_get
+
+emotions_bp = Blueprint('emotions', __name__, url_prefix='/api')
+
+
+def _parse_date(name):
+    value = request.args.get(name)
+    return date.fromisoformat(value) if value else None
+
+
+@emotions_bp.route("/emotions/trend/", methods=["GET"])
+@firebase_auth_required
+@conditional_get
+def get_emotion_trend():
+    """
+    Emotion averages over time, served from the per-user rollups
+
+    Query params:
+        granularity: "day" (default) or "week"
+        start, end: optional ISO dates bounding the bucket starts
+        resample: optional pandas offset alias (e.g. "MS", "2W-MON") to re-bucket the series
+    """
+    granularity = request.args.get("granularity", "day")
+    if granularity not in GRANULARITIES:
+        return jsonify({"error": f"granularity must be one of: {', '.join(GRANULARITIES)}"}), 400
+
+    try:
+        start, end = _parse_date("start"), _parse_date("end")
+    except ValueError:
+        return jsonify({"error": "start and end must be ISO dates (YYYY-MM-DD)"}), 400
+
+    rows = load_rollups(request.user.id, granularity, start, end)
+
+    resample = request.args.get("resample")
+    if resample:
+        try:
+            series = resampled_trend_series(rows, resample)
+        except ValueError:
+            return jsonify({"error": f"Invalid resample rule: {resample}"}), 400
+    else:
+        series = trend_series(rows)
+
+    return jsonify({
+        "granularity": granularity,
+        "resample": resample,
+        "buckets": series
+    }), 200
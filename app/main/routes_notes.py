@@ -1,9 +1,22 @@
-from flask import Blueprint, jsonify, request
-from app.models.note import Note, NoteSchema
+import json
+from flask import Blueprint, Response, jsonify, request, stream_with_context
+from marshmallow import ValidationError
+from app.models.note import Note, NoteSchema, NoteImportSchema
 from app.extensions import db
 from app.auth.firebase_auth import firebase_auth_required
-from app.utils.tasks import send_note, generate_advice_task
+from app.utils.tasks import send_note, send_notes_batch
+from app.utils.advice_trigger import start_advice_generation
+from app.utils.emotion_scores import note_content_hash
+from app.utils.emotion_rollups import note_emotion_values, record_rollup_changes
+from app.utils.user_counters import record_notes_added, record_note_removed
 from app.utils.api_utils import should_generate_advice
+from app.utils.note_queries import (
+    note_list_statement, parse_fields, serialize_note_rows, next_cursor,
+    get_note_with_formattings, insert_formattings, replace_formattings, bulk_insert_notes
+)
+from app.models.formatting import FormattingSchema
+from app.utils.versioning import conditional_get, bump_user_version
+from app.config import config
 from celery.result import AsyncResult
 
 notes_bp = Blueprint('notes', __name__, url_prefix='/api')
@@ -20,34 +33,95 @@ def create_note():
     data = request.get_json()
     note = NoteSchema().load(data)
     
+    # Formattings are bulk inserted once the note has an id
+    formattings = list(note.formattings)
+    note.formattings = []
+    
     # Add user_id from the authenticated user
     note.user_id = request.user.id
     
     # Create and save the note
     db.session.add(note)
+    db.session.flush()
+    insert_formattings(note, formattings)
+    record_notes_added(request.user.id)
+    response = note_schema.dump(note)
     db.session.commit()
+    bump_user_version(request.user.id)
     
     # Start emotion analysis task asynchronously
-    if note.content:
-        emotion_task = send_note.delay(note.id, note.content)
+    content = response["content"]
+    if content:
+        emotion_task = send_note.delay(response["id"], content, note_content_hash(content))
         print(f"Started emotion analysis task with ID: {emotion_task.id}")
     
     # Check if advice should be generated
     if should_generate_advice(request.user.id):
-        advice_task = generate_advice_task.delay(request.user.id)
-        print(f"Started advice generation task with ID: {advice_task.id}")
+        advice_task_id, started = start_advice_generation(request.user.id)
+        if started:
+            print(f"Started advice generation task with ID: {advice_task_id}")
+    
+    return jsonify(response), 201
+
+
+@notes_bp.route("/notes/batch", methods=["POST"])
+@firebase_auth_required
+def create_notes_batch():
+    """
+    Endpoint for importing many notes at once (e.g. migrating from another journaling app)
+
+    Accepts {"notes": [...]} where each note is shaped like POST /api/note/ plus an
+    optional original `created_at`. Everything is inserted in one transaction,
+    emotion analysis runs as one chunked task and advice eligibility is checked once.
+    """
+    data = request.get_json()
+    notes_data = data.get("notes") if isinstance(data, dict) else None
+    
+    if not isinstance(notes_data, list) or not notes_data:
+        return jsonify({"error": "A non-empty 'notes' list is required"}), 400
+    
+    if len(notes_data) > config.NOTES_BATCH_MAX_SIZE:
+        return jsonify({"error": f"At most {config.NOTES_BATCH_MAX_SIZE} notes can be imported per request"}), 413
+    
+    try:
+        notes_data = NoteImportSchema(many=True).load(notes_data)
+    except ValidationError as e:
+        return jsonify({"error": "Invalid notes", "details": e.messages}), 400
+    
+    # Insert all notes and formattings in a single transaction
+    note_ids = bulk_insert_notes(request.user.id, notes_data)
+    record_notes_added(request.user.id, created_ats=[data.get("created_at") for data in notes_data])
+    db.session.commit()
+    bump_user_version(request.user.id)
+    
+    # One emotion job for the whole import instead of one task per note
+    emotion_task = send_notes_batch.delay(note_ids)
+    print(f"Started batch emotion analysis task with ID: {emotion_task.id} for {len(note_ids)} notes")
+    
+    # Check advice eligibility once for the whole batch
+    advice_task_id = None
+    if should_generate_advice(request.user.id):
+        advice_task_id, started = start_advice_generation(request.user.id)
+        if started:
+            print(f"Started advice generation task with ID: {advice_task_id}")
     
-    return jsonify(note_schema.dump(note)), 201
+    return jsonify({
+        "created": len(note_ids),
+        "note_ids": note_ids,
+        "emotion_task_id": emotion_task.id,
+        "advice_task_id": advice_task_id
+    }), 201
 
 
 @notes_bp.route("/note/<int:note_id>/", methods=["GET"])
 @firebase_auth_required
+@conditional_get
 def get_note(note_id):
     """
     Endpoint for getting an individual note with sentiment analysis
     """
-    # Find the note by ID
-    note = Note.query.get(note_id)
+    # Find the note by ID (formattings are loaded with it)
+    note = get_note_with_formattings(note_id)
     
     if not note:
         return jsonify({"error": "Note not found"}), 404
@@ -62,25 +136,59 @@ def get_note(note_id):
 
 @notes_bp.route("/note/", methods=["GET"])
 @firebase_auth_required
+@conditional_get
 def get_user_notes():
     """
-    Endpoint for getting all notes for the authenticated user (without sentiment analysis)
+    Endpoint for getting the authenticated user's notes (without sentiment analysis by default)
+
+    Query parameters:
+        limit: page size; enables keyset pagination and returns `next_cursor`
+        cursor: opaque cursor from a previous page's `next_cursor`
+        fields: comma separated note columns to return (default: id,content,created_at)
+        stream: "true" to stream every remaining note with flat memory use;
+            cannot be combined with `limit` (400)
     """
-    # Get all notes for the authenticated user
-    notes = Note.query.filter_by(user_id=request.user.id).order_by(Note.created_at).all()
-    
-    # Create a simplified schema for listing (without sentiment analysis)
-    notes_list = []
-    for note in notes:
-        note_data = {
-            "id": note.id,
-            "content": note.content,
-            "created_at": note.created_at.isoformat() if note.created_at else None
-        }
-        
-        notes_list.append(note_data)
+    try:
+        fields = parse_fields(request.args.get("fields"))
+        cursor = request.args.get("cursor")
+        limit = request.args.get("limit", type=int)
+        stream = request.args.get("stream", "false").lower() == "true"
+
+        if stream and limit is not None:
+            raise ValueError("'limit' cannot be combined with 'stream'; streaming returns every remaining note")
+        if stream:
+            stmt = note_list_statement(request.user.id, fields, cursor=cursor)
+        elif limit is not None or cursor:
+            limit = min(max(limit or config.NOTES_PAGE_DEFAULT_LIMIT, 1), config.NOTES_PAGE_MAX_LIMIT)
+            # Fetch one extra row to know whether another page exists
+            stmt = note_list_statement(request.user.id, fields, cursor=cursor, limit=limit + 1)
+        else:
+            stmt = note_list_statement(request.user.id, fields)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    if stream:
+        def generate():
+            yield '{"notes": ['
+            rows = db.session.execute(stmt.execution_options(yield_per=config.NOTES_STREAM_BATCH_SIZE))
+            first = True
+            for partition in rows.partitions():
+                for note_data in serialize_note_rows(partition, fields):
+                    yield ("" if first else ",") + json.dumps(note_data)
+                    first = False
+            yield "]}"
+
+        return Response(stream_with_context(generate()), mimetype="application/json"), 200
+
+    rows = db.session.execute(stmt).all()
     
-    return jsonify({"notes": notes_list}), 200
+    if limit is None:
+        return jsonify({"notes": serialize_note_rows(rows, fields)}), 200
+
+    return jsonify({
+        "notes": serialize_note_rows(rows[:limit], fields),
+        "next_cursor": next_cursor(rows, limit)
+    }), 200
 
 
 @notes_bp.route("/note/<int:note_id>/", methods=["PUT"])
@@ -89,8 +197,8 @@ def update_note(note_id):
     """
     Endpoint for updating a note
     """
-    # Find the note by ID
-    note = Note.query.get(note_id)
+    # Find the note by ID (formattings are loaded with it)
+    note = get_note_with_formattings(note_id)
     
     if not note:
         return jsonify({"error": "Note not found"}), 404
@@ -104,18 +212,36 @@ def update_note(note_id):
     if not data or 'content' not in data:
         return jsonify({"error": "Content field is required"}), 400
     
+    formattings = None
+    if 'formattings' in data:
+        formattings = FormattingSchema(many=True).load(data['formattings'] or [])
+    
+    # Re-analyze only when the text actually changed
+    content_changed = data['content'] != note.content
+    
     # Update the note content
     note.content = data['content']
     
+    # Replace formattings in bulk when provided
+    if formattings is not None:
+        replace_formattings(note, formattings)
+    
     # Save the changes
+    response = note_schema.dump(note)
     db.session.commit()
+    bump_user_version(request.user.id)
     
-    # Start new emotion analysis task asynchronously
-    if note.content:
-        emotion_task = send_note.delay(note.id, note.content)
+    # Start new emotion analysis task once edits settle; tasks for
+    # intermediate text find the content changed and skip themselves
+    content = response["content"]
+    if content and content_changed:
+        emotion_task = send_note.apply_async(
+            args=[note_id, content, note_content_hash(content)],
+            countdown=config.EMOTION_DEBOUNCE_SECONDS
+        )
         print(f"Started emotion analysis task for update with ID: {emotion_task.id}")
     
-    return jsonify(note_schema.dump(note)), 200
+    return jsonify(response), 200
 
 
 @notes_bp.route("/note/<int:note_id>/", methods=["DELETE"])
@@ -124,8 +250,8 @@ def delete_note(note_id):
     """
     Endpoint for deleting a note
     """
-    # Find the note by ID
-    note = Note.query.get(note_id)
+    # Find the note by ID (locked so an in-flight score write can't slip past the rollup update)
+    note = db.session.get(Note, note_id, with_for_update=True)
     
     if not note:
         return jsonify({"error": "Note not found"}), 404
@@ -134,9 +260,14 @@ def delete_note(note_id):
     if note.user_id != request.user.id:
         return jsonify({"error": "Unauthorized to delete this note"}), 403
     
+    # Take the note out of its emotion rollups and the user's counters
+    record_rollup_changes([(note.user_id, note.created_at, note_emotion_values(note), None)])
+    record_note_removed(note.user_id, note.created_at)
+    
     # Delete the note (cascade will handle related formattings)
     db.session.delete(note)
     db.session.commit()
+    bump_user_version(request.user.id)
     
     return jsonify({"message": "Note deleted successfully"}), 200
 
@@ -1,16 +1,20 @@
-from app.models.note import Note, NoteSchema
+from app.models.note import Note, NoteSchema, NoteImportSchema
 from app.models.weekly_advice import WeeklyAdvice, WeeklyAdviceSchema
 from app.models.user import User, UserSchema
 from app.models.formatting import Formatting, FormattingSchema
 from app.models.quote import Quote, QuoteSchema
 from app.models.user_memory import UserMemory, UserMemorySchema
+from app.models.user_emotion_rollup import UserEmotionRollup
+from app.models.user_counters import UserCounters
 
 # Define what should be available when using "from models import *"
 __all__ = [
     'User', 'UserSchema',
-    'Note', 'NoteSchema',
+    'Note', 'NoteSchema', 'NoteImportSchema',
     'WeeklyAdvice', 'WeeklyAdviceSchema',
     'Formatting', 'FormattingSchema',
     'Quote', 'QuoteSchema',
-    'UserMemory', 'UserMemorySchema'
+    'UserMemory', 'UserMemorySchema',
+    'UserEmotionRollup',
+    'UserCounters'
 ]
@@ -13,7 +13,7 @@ class Formatting(db.Model):
     """
     __tablename__ = "formatting"
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
-    note_id = db.Column(db.Integer, db.ForeignKey("notes.id"), nullable=False) # one-to-many each note can have many formatting
+    note_id = db.Column(db.Integer, db.ForeignKey("notes.id"), nullable=False, index=True) # one-to-many each note can have many formatting
     
     # Formatting type (header, bold, italic)
     type = db.Column(db.Enum(FormattingType), nullable=False)
@@ -7,6 +7,9 @@ class Note(db.Model):
     Note Model with Sentiment Values associated 
     """
     __tablename__ = "notes"
+    __table_args__ = (
+        db.Index("ix_notes_user_id_created_at", "user_id", "created_at"), # per-user timelines
+    )
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False) # one-to-many each user can have many notes
     content = db.Column(db.Text, nullable=False) # db.Text is more large string values
@@ -42,4 +45,15 @@ class NoteSchema(ma.SQLAlchemySchema):
     sadness_value = ma.auto_field(dump_only=True)
     surprise_value = ma.auto_field(dump_only=True)
     created_at = ma.auto_field(dump_only=True)
-    formattings = ma.Nested(FormattingSchema, many=True, exclude=("note_id",), required=False)
\ No newline at end of file
+    formattings = ma.Nested(FormattingSchema, many=True, exclude=("note_id",), required=False)
+
+class NoteImportSchema(NoteSchema):
+    """
+    Schema for bulk imported notes: loads plain dicts (no ORM instances) and
+    accepts the note's original `created_at` from the app it was exported from
+    """
+    class Meta(NoteSchema.Meta):
+        load_instance = False
+
+    created_at = ma.auto_field(required=False)
+    formattings = ma.Nested(FormattingSchema(load_instance=False, exclude=("note_id",)), many=True, required=False)
@@ -0,0 +1,20 @@
+from app.extensions import db
+
+class UserCounters(db.Model):
+    """
+    Per-user note counters, kept in the same transaction as the notes they count
+
+    Lets advice/memory eligibility be answered with a primary-key read instead
+    of counting notes.
+    """
+    __tablename__ = "user_counters"
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id"), primary_key=True)
+    notes_total = db.Column(db.Integer, nullable=False, default=0)
+    notes_since_advice = db.Column(db.Integer, nullable=False, default=0) # notes created after last_advice_at
+    notes_since_memory = db.Column(db.Integer, nullable=False, default=0) # notes created after last_memory_at
+    last_advice_at = db.Column(db.DateTime(timezone=True), nullable=True)
+    last_memory_at = db.Column(db.DateTime(timezone=True), nullable=True)
+    updated_at = db.Column(db.DateTime(timezone=True), default=db.func.now(), onupdate=db.func.now())
+
+    def __repr__(self):
+        return f"<Counters for User {self.user_id}: {self.notes_total} notes>"
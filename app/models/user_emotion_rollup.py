@@ -0,0 +1,24 @@
+from app.extensions import db
+
+class UserEmotionRollup(db.Model):
+    """
+    Per-user emotion totals for one day or week of notes, maintained incrementally
+
+    Only notes that have been scored count. Averages are `<emotion>_sum / note_count`.
+    """
+    __tablename__ = "user_emotion_rollups"
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id"), primary_key=True)
+    granularity = db.Column(db.String(4), primary_key=True) # "day" or "week" (weeks start on Monday, UTC)
+    bucket_start = db.Column(db.Date, primary_key=True)
+    note_count = db.Column(db.Integer, nullable=False, default=0)
+    anger_sum = db.Column(db.Float, nullable=False, default=0.0)
+    disgust_sum = db.Column(db.Float, nullable=False, default=0.0)
+    fear_sum = db.Column(db.Float, nullable=False, default=0.0)
+    joy_sum = db.Column(db.Float, nullable=False, default=0.0)
+    neutral_sum = db.Column(db.Float, nullable=False, default=0.0)
+    sadness_sum = db.Column(db.Float, nullable=False, default=0.0)
+    surprise_sum = db.Column(db.Float, nullable=False, default=0.0)
+    updated_at = db.Column(db.DateTime(timezone=True), default=db.func.now(), onupdate=db.func.now())
+
+    def __repr__(self):
+        return f"<EmotionRollup {self.granularity} {self.bucket_start} for User {self.user_id}>"
@@ -6,6 +6,9 @@ class UserMemory(db.Model):
     Stores summarized memories of user's notes in batches for context building
     """
     __tablename__ = "user_memories"
+    __table_args__ = (
+        db.Index("ix_user_memories_user_id_created_at", "user_id", "created_at"),
+    )
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
     
@@ -6,6 +6,9 @@ class WeeklyAdvice(db.Model):
     Advice for user based on their emotional patterns, recent notes, and memories
     """
     __tablename__ = "weekly_advices"
+    __table_args__ = (
+        db.Index("ix_weekly_advices_user_id_created_at", "user_id", "created_at"),
+    )
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
     content = db.Column(db.Text, nullable=False)
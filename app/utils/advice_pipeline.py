@@ -0,0 +1,143 @@
+import asyncio
+import time
+from contextlib import contextmanager
+from typing import Dict, Tuple
+from flask import Flask, current_app
+from app.extensions import db
+from app.models.weekly_advice import WeeklyAdvice
+from app.utils.api_utils import build_advice_prompt, create_memory_summary, request_advice, save_advice
+from app.utils.memory_manager import MemoryManager
+
+
+class StageTimings:
+    """Wall-clock duration of each pipeline stage in milliseconds (stages may overlap)"""
+
+    def __init__(self):
+        self.timings = {}
+
+    @contextmanager
+    def stage(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name] = round((time.perf_counter() - started) * 1000, 1)
+
+
+def _with_app_context(app: Flask, func, *args):
+    # Each thread gets its own app context and so its own DB session; the session
+    # is closed on exit, leaving the loaded objects detached but readable
+    with app.app_context():
+        return func(*args)
+
+
+def _load_memory_batch(user_id: int):
+    """Notes for the next memory, or None when no memory is due"""
+    if not MemoryManager.should_create_memory(user_id):
+        return None
+    notes = MemoryManager.get_notes_for_memory(user_id)
+    return notes if len(notes) >= MemoryManager.NOTES_PER_MEMORY else None
+
+
+def _save_memory(memory) -> bool:
+    """Save the new memory; a failure is logged and advice goes ahead without it"""
+    try:
+        MemoryManager.save_memory(memory)
+        return True
+    except Exception as e:
+        print(f"Error creating memory for user {memory.user_id}: {e}")
+        db.session.rollback()
+        return False
+
+
+def _save_advice(user_id: int, advice_content: str, context: Dict) -> WeeklyAdvice:
+    try:
+        advice = save_advice(user_id, advice_content, context)
+        # Load the committed row so it stays readable after this thread's session closes
+        db.session.refresh(advice)
+        return advice
+    except Exception:
+        db.session.rollback()
+        raise
+
+
+async def _advice_pipeline(app: Flask, user_id: int, attempt_id: str, timings: StageTimings) -> WeeklyAdvice:
+    def in_thread(func, *args):
+        return asyncio.to_thread(_with_app_context, app, func, *args)
+
+    async def memory_branch():
+        with timings.stage("load_memory_notes"):
+            try:
+                notes = await in_thread(_load_memory_batch, user_id)
+            except Exception as e:
+                # A due memory is optional; advice is still generated without it
+                print(f"Error loading notes for memory for user {user_id}: {e}")
+                notes = None
+        if notes is None:
+            return None
+        with timings.stage("memory_summary"):
+            summary = await asyncio.to_thread(create_memory_summary, notes)
+        return MemoryManager.build_memory(user_id, notes, summary)
+
+    async def context_branch():
+        with timings.stage("load_context"):
+            return await asyncio.gather(
+                in_thread(MemoryManager.get_recent_memories, user_id),
+                in_thread(MemoryManager.get_recent_notes, user_id)
+            )
+
+    # The memory summary call runs while the advice context loads
+    new_memory, (memories, recent_notes) = await asyncio.gather(memory_branch(), context_branch())
+
+    if new_memory is not None:
+        memories = [new_memory] + memories[:MemoryManager.MAX_MEMORIES_FOR_ADVICE - 1]
+    context = MemoryManager.build_advice_context(memories, recent_notes)
+
+    if not context['recent_notes'] and not context['memories']:
+        raise Exception("No notes or memories available for advice generation")
+
+    prompt = build_advice_prompt(context)
+
+    async def advice_branch():
+        with timings.stage("advice_completion"):
+            return await asyncio.to_thread(request_advice, prompt, attempt_id)
+
+    async def save_memory_branch():
+        if new_memory is None:
+            return True
+        with timings.stage("save_memory"):
+            return await in_thread(_save_memory, new_memory)
+
+    # The advice prompt already holds the new memory, so saving it overlaps the advice call
+    advice_content, memory_saved = await asyncio.gather(advice_branch(), save_memory_branch())
+    if not memory_saved:
+        # Don't record an unsaved memory as used by this advice
+        context['memories'] = [memory for memory in context['memories'] if memory is not new_memory]
+
+    with timings.stage("save_advice"):
+        return await in_thread(_save_advice, user_id, advice_content, context)
+
+
+def run_advice_pipeline(user_id: int, attempt_id: str) -> Tuple[WeeklyAdvice, Dict[str, float]]:
+    """
+    Create any due memory and generate advice, overlapping independent I/O
+
+    Stages:
+        load_memory_notes -> memory_summary     (concurrently with)  load_context
+        advice_completion                       (concurrently with)  save_memory
+        save_advice
+
+    `attempt_id` scopes the cached advice completion to one generation (and its
+    retries). Returns the saved advice and per-stage timings in milliseconds (plus "total").
+    Must be called inside an app context, outside any running event loop.
+    """
+    timings = StageTimings()
+    app = current_app._get_current_object()
+    try:
+        with timings.stage("total"):
+            advice = asyncio.run(_advice_pipeline(app, user_id, attempt_id, timings))
+    except Exception as e:
+        print(f"Error generating advice for user {user_id}: {e}")
+        raise Exception(f"Failed to generate advice for user {user_id}: {str(e)}")
+
+    return advice, timings.timings
@@ -0,0 +1,124 @@
+import uuid
+from typing import Optional, Tuple
+from app.config import config
+from app.extensions import get_redis_client
+from app.utils.redis_lock import RedisLock
+from app.utils.user_counters import get_user_counters
+
+LOCK_KEY = "techtive:advice:lock:{user_id}"
+# One key per triggering note range: the notes counted since the last advice
+TRIGGER_KEY = "techtive:advice:trigger:{user_id}:{since}:{notes_total}"
+# Lock tokens of streamed generations; anything else holding the lock is a Celery task id
+STREAM_HOLDER_PREFIX = "stream:"
+
+
+def _advice_lock(client, user_id: int, token: str = None) -> RedisLock:
+    return RedisLock(client, LOCK_KEY.format(user_id=user_id), config.ADVICE_LOCK_LEASE_SECONDS, token=token)
+
+
+def holder_task_id(holder: Optional[str]) -> Optional[str]:
+    """The Celery task id behind a lock holder, or None for a streamed generation (nothing to poll)"""
+    if holder is None or holder.startswith(STREAM_HOLDER_PREFIX):
+        return None
+    return holder
+
+
+def start_advice_generation(user_id: int) -> Tuple[Optional[str], bool]:
+    """
+    Enqueue generate_advice_task unless one is already running for this user
+
+    Returns (task_id, started). A duplicate trigger (a second note, a manual
+    request, a retried request for the same notes) gets the task_id of the
+    in-flight or already finished generation for the same note range instead
+    of paying for another OpenAI call, or None when the generation in flight
+    is a stream with no task to poll. Without Redis every trigger enqueues.
+    """
+    from app.utils.tasks import generate_advice_task
+
+    client = get_redis_client()
+    if client is None:
+        return generate_advice_task.delay(user_id).id, True
+
+    task_id = uuid.uuid4().hex
+    try:
+        counters = get_user_counters(user_id)
+        last_advice_at = counters.last_advice_at if counters else None
+        trigger_key = TRIGGER_KEY.format(
+            user_id=user_id,
+            since=last_advice_at.timestamp() if last_advice_at else 0,
+            notes_total=counters.notes_total if counters else 0
+        )
+
+        existing = client.get(trigger_key)
+        if existing is not None:
+            return existing.decode("utf-8") if isinstance(existing, bytes) else existing, False
+
+        lock = _advice_lock(client, user_id, token=task_id)
+        if not lock.acquire():
+            holder = lock.holder()
+            # The holder may finish between the two calls; then this trigger starts the next run
+            if holder is not None or not lock.acquire():
+                return holder_task_id(holder or lock.holder()), False
+
+        client.set(trigger_key, task_id, ex=config.ADVICE_IDEMPOTENCY_TTL)
+    except Exception as e:
+        print(f"WARNING: Advice single-flight unavailable for user {user_id}: {e}")
+        return generate_advice_task.delay(user_id).id, True
+
+    try:
+        generate_advice_task.apply_async(
+            args=[user_id], kwargs={"lock_token": task_id, "trigger_key": trigger_key}, task_id=task_id
+        )
+    except Exception:
+        # Nothing will release the lock or finish the trigger; free both for the next attempt
+        finish_advice_generation(user_id, task_id, trigger_key=trigger_key)
+        raise
+    return task_id, True
+
+
+def claim_advice_lock(user_id: int) -> Tuple[Optional[str], Optional[str]]:
+    """
+    Take the user's advice lock for generation done outside generate_advice_task
+
+    Returns (token, None) when taken, to be passed to finish_advice_generation,
+    or (None, holder) with the current holder's token (see holder_task_id).
+    Without Redis nothing is locked and the token is None.
+    """
+    client = get_redis_client()
+    if client is None:
+        return None, None
+    token = STREAM_HOLDER_PREFIX + uuid.uuid4().hex
+    try:
+        lock = _advice_lock(client, user_id, token=token)
+        if lock.acquire():
+            return token, None
+        return None, lock.holder()
+    except Exception as e:
+        print(f"WARNING: Advice single-flight unavailable for user {user_id}: {e}")
+        return None, None
+
+
+def finish_advice_generation(user_id: int, lock_token: str, retrying: bool = False,
+                             trigger_key: Optional[str] = None, succeeded: bool = False):
+    """
+    Release the user's advice lock, or renew its lease while the task waits to retry
+
+    Unless the generation succeeded, its `trigger_key` is dropped as well so the
+    same notes can trigger a new attempt instead of pointing at a failed task.
+    """
+    if lock_token is None:
+        return
+    client = get_redis_client()
+    if client is None:
+        return
+    try:
+        # Drop the trigger before the lock so no new trigger can pick up the failed task id
+        if trigger_key is not None and not retrying and not succeeded:
+            client.delete(trigger_key)
+        lock = _advice_lock(client, user_id, token=lock_token)
+        if retrying:
+            lock.extend()
+        else:
+            lock.release()
+    except Exception as e:
+        print(f"WARNING: Failed to release advice lock for user {user_id}: {e}")
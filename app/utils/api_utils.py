@@ -1,10 +1,19 @@
+import hashlib
+import json
 import requests
-from typing import List, Optional, Dict
+from typing import Iterator, List, Dict, Optional
 from datetime import datetime, timezone
 from app.models.note import Note
 from app.models.weekly_advice import WeeklyAdvice
-from app.extensions import db
+from app.extensions import db, get_redis_client
 from app.config import config
+from app.utils.versioning import bump_user_version
+from app.utils.http_clients import hf_client, openai_client
+from app.utils.cache import TieredCache
+from app.utils.user_counters import get_user_counters, reset_advice_counter
+from app.utils.prompt_budget import (
+    PromptItem, PromptSection, build_budgeted_prompt, note_intensity, recency_priority
+)
 
 def call_hf_emotion_api(content):
     """
@@ -16,6 +25,21 @@ def call_hf_emotion_api(content):
     Returns:
         list: List of emotion predictions with labels and scores
         
+    Raises:
+        Exception: If API call fails
+    """
+    return call_hf_emotion_api_batch([content])[0]
+
+def call_hf_emotion_api_batch(contents):
+    """
+    Call Hugging Face Inference API for emotion analysis of many texts in one request
+    
+    Args:
+        contents (list): Text contents to analyze
+        
+    Returns:
+        list: One list of emotion predictions (labels and scores) per content, in order
+        
     Raises:
         Exception: If API call fails
     """
@@ -29,19 +53,15 @@ def call_hf_emotion_api(content):
         "Authorization": f"Bearer {api_token}"
     }
     
-    # Use the model URL from config
-    api_url = config.HUGGING_FACE_MODEL_URL
-
     payload = {
-        "inputs": content 
+        "inputs": list(contents)
     }
     
     try:
-        response = requests.post(
-            api_url,
+        # Pooled session on the configured model URL, retrying 429/5xx
+        response = hf_client().post(
             headers=headers,
-            json=payload,
-            timeout=30
+            json=payload
         )
         
         if response.status_code != 200:
@@ -57,235 +77,306 @@ def call_hf_emotion_api(content):
             else:
                 raise Exception(f"API error: {emotion_data['error']}")
         
-        emotions = None
-        
-        if isinstance(emotion_data, list):
-            if len(emotion_data) > 0:
-                emotions = emotion_data[0]  # Nested format
-        
-        # Validate we have the emotions in the expected format
-        if not emotions or not isinstance(emotions, list):
+        # Validate we have one list of emotions per input (nested format)
+        if not isinstance(emotion_data, list) or len(emotion_data) != len(payload["inputs"]):
             raise Exception(f"Could not extract emotion data from response")
         
-        # Validate emotion objects have required fields
-        for emotion in emotions:
-            if not isinstance(emotion, dict) or "label" not in emotion or "score" not in emotion:
-                raise Exception(f"Invalid emotion object format")
+        for emotions in emotion_data:
+            if not emotions or not isinstance(emotions, list):
+                raise Exception(f"Could not extract emotion data from response")
+            
+            # Validate emotion objects have required fields
+            for emotion in emotions:
+                if not isinstance(emotion, dict) or "label" not in emotion or "score" not in emotion:
+                    raise Exception(f"Invalid emotion object format")
         
-        return emotions
+        return emotion_data
         
     except requests.exceptions.RequestException as e:
         raise Exception(f"Network error: {e}")
     except Exception as e:
         raise 
 
-def create_memory_summary(notes: List[Note]) -> str:
-    """Use OpenAI to create a concise summary of a batch of notes"""
-    try:
-        api_token = config.OPENAI_API_KEY
-        
-        # Prepare notes content for summarization
-        notes_content = []
-        for i, note in enumerate(notes, 1):
-            # Get emotion info
-            emotions = {
-                'joy': note.joy_value,
-                'sadness': note.sadness_value,
-                'anger': note.anger_value,
-                'fear': note.fear_value,
-                'neutral': note.neutral_value
-            }
-            dominant = max(emotions.items(), key=lambda x: x[1])
-            
-            notes_content.append(f"Note {i} (mostly {dominant[0]}): {note.content[:200]}")
-        
-        prompt = f"""Summarize these {len(notes)} journal entries into a concise memory summary that is specific (2-3 sentences max).
+# Completions keyed by their full request, so task retries and duplicate triggers don't pay twice
+llm_response_cache = TieredCache(
+    "llm:completions",
+    maxsize=config.LLM_CACHE_SIZE,
+    default_ttl=config.LLM_CACHE_TTL,
+    redis_getter=get_redis_client
+)
 
-                    Notes to summarize:
-                    {chr(10).join(notes_content)}
+def llm_cache_key(model: str, messages: List[Dict], temperature: float, max_tokens: int,
+                  scope: Optional[str] = None) -> str:
+    request_json = json.dumps(
+        {"model": model, "messages": messages, "temperature": temperature, "max_tokens": max_tokens, "scope": scope},
+        sort_keys=True, ensure_ascii=False
+    )
+    return hashlib.sha256(request_json.encode("utf-8")).hexdigest()
 
-                    Create a memory summary that captures the essence of this period:"""
+def chat_completion(messages: List[Dict], max_tokens: int, temperature: float, model: str = None,
+                    cache_scope: Optional[str] = None) -> str:
+    """
+    Call the OpenAI chat completions API and return the first choice's text
+    
+    Successful completions are cached (LLM_CACHE_TTL), so an identical request
+    returns the earlier text without calling OpenAI. Pass `cache_scope` (e.g. a
+    task id) to share the entry only with retries of the same attempt.
+    
+    Raises:
+        Exception: If the API key is missing or the API call fails
+    """
+    model = model or config.OPENAI_MODEL
+    cache_key = None
+    if config.LLM_CACHE_ENABLED:
+        cache_key = llm_cache_key(model, messages, temperature, max_tokens, scope=cache_scope)
+        cached = llm_response_cache.get(cache_key)
+        if cached is not None:
+            return cached
+    
+    # Validate API key
+    api_token = config.OPENAI_API_KEY
+    if not api_token:
+        raise Exception("OPENAI_API_KEY not configured in environment variables")
+    
+    headers = {
+        "Authorization": f"Bearer {api_token}",
+        "Content-Type": "application/json"
+    }
+    
+    payload = {
+        "model": model,
+        "messages": messages,
+        "max_tokens": max_tokens,
+        "temperature": temperature
+    }
+    
+    response = openai_client().post(
+        "chat/completions",
+        headers=headers,
+        json=payload
+    )
+    
+    if response.status_code != 200:
+        raise Exception(f"OpenAI API request failed with status {response.status_code}")
+    
+    result = response.json()
+    if "choices" not in result or len(result["choices"]) == 0:
+        raise Exception("Invalid OpenAI API response format")
+    
+    content = result["choices"][0]["message"]["content"].strip()
+    if content and cache_key is not None:
+        llm_response_cache.set(cache_key, content)
+    
+    return content
 
-        headers = {
-            "Authorization": f"Bearer {api_token}",
-            "Content-Type": "application/json"
-        }
-        
-        payload = {
-            "model": "gpt-3.5-turbo",
-            "messages": [
-                {
-                    "role": "system",
-                    "content": "You are an AI that creates concise memory summaries of journal entries. Focus on emotional patterns and key themes."
-                },
-                {
-                    "role": "user",
-                    "content": prompt
-                }
-            ],
-            "max_tokens": 150,
-            "temperature": 0.7
-        }
-        
-        response = requests.post(
-            "https://api.openai.com/v1/chat/completions",
-            headers=headers,
-            json=payload,
-            timeout=30
-        )
+def stream_chat_completion(messages: List[Dict], max_tokens: int, temperature: float, model: str = None) -> Iterator[str]:
+    """
+    Like chat_completion, but yields the completion's text as it is generated
+    
+    Uses the API's `stream=True` server-sent events. Streams are never cached:
+    each one is a single attempt with no retry to serve, and a cached text
+    would be saved again as duplicate advice.
+    """
+    model = model or config.OPENAI_MODEL
+    
+    api_token = config.OPENAI_API_KEY
+    if not api_token:
+        raise Exception("OPENAI_API_KEY not configured in environment variables")
+    
+    headers = {
+        "Authorization": f"Bearer {api_token}",
+        "Content-Type": "application/json"
+    }
+    
+    payload = {
+        "model": model,
+        "messages": messages,
+        "max_tokens": max_tokens,
+        "temperature": temperature,
+        "stream": True
+    }
+    
+    response = openai_client().post(
+        "chat/completions",
+        headers=headers,
+        json=payload,
+        stream=True
+    )
+    
+    with response:
+        if response.status_code != 200:
+            raise Exception(f"OpenAI API request failed with status {response.status_code}")
         
-        if response.status_code == 200:
-            result = response.json()
-            if "choices" in result and len(result["choices"]) > 0:
-                return result["choices"][0]["message"]["content"].strip()
+        for line in response.iter_lines(decode_unicode=True):
+            if not line or not line.startswith("data:"):
+                continue
+            data = line[len("data:"):].strip()
+            if data == "[DONE]":
+                break
+            
+            choices = json.loads(data).get("choices") or []
+            content = (choices[0].get("delta") or {}).get("content") if choices else None
+            if content:
+                yield content
+
+def build_memory_summary_prompt(notes: List[Note]) -> str:
+    """Summary prompt for a batch of notes (oldest first), fitted into MEMORY_SUMMARY_PROMPT_TOKEN_BUDGET"""
+    # Newest and most intense notes are kept first when they don't all fit
+    items = []
+    for rank, note in enumerate(reversed(notes)):
+        items.append(PromptItem(
+            note.content,
+            priority=recency_priority(rank) + note_intensity(note),
+            label=_dominant_emotion(note)
+        ))
+    items.reverse()
+    
+    return build_budgeted_prompt(
+        head=[
+            f"Summarize these {len(notes)} journal entries into a concise memory summary that is specific (2-3 sentences max).",
+            "",
+            "Notes to summarize:"
+        ],
+        sections=[PromptSection(items, line_format="Note {i} (mostly {label}): {content}")],
+        tail=["Create a memory summary that captures the essence of this period:"],
+        budget=config.MEMORY_SUMMARY_PROMPT_TOKEN_BUDGET
+    )
+
+def create_memory_summary(notes: List[Note]) -> str:
+    """Use OpenAI to create a concise summary of a batch of notes"""
+    try:
+        prompt = build_memory_summary_prompt(notes)
+        
+        messages = [
+            {
+                "role": "system",
+                "content": "You are an AI that creates concise memory summaries of journal entries. Focus on emotional patterns and key themes."
+            },
+            {
+                "role": "user",
+                "content": prompt
+            }
+        ]
         
-        return ""
+        return chat_completion(messages, max_tokens=150, temperature=0.7)
         
     except Exception as e:
         print(f"Error creating memory summary: {e}")
         return ""
 
-def generate_and_save_advice(user_id: int) -> Optional[WeeklyAdvice]:
-    """Generate and save new advice using memories + recent notes"""
-    try:
-        from app.utils.memory_manager import MemoryManager
-        
-        # Validate API key
-        api_token = config.OPENAI_API_KEY
-        if not api_token:
-            raise Exception("OPENAI_API_KEY not configured in environment variables")
-        
-        # First, create memory if needed
-        if MemoryManager.should_create_memory(user_id):
-            MemoryManager.create_and_save_memory(user_id)
-        
-        # Get context for advice
-        context = MemoryManager.get_context_for_advice(user_id)
-        
-        if not context['recent_notes'] and not context['memories']:
-            raise Exception("No notes or memories available for advice generation")
-        
-        # Build prompt with memories and recent notes
-        prompt_parts = [
+def _dominant_emotion(note) -> str:
+    note_emotions = {
+        'joy': note.joy_value, 'sadness': note.sadness_value,
+        'anger': note.anger_value, 'fear': note.fear_value,
+        'neutral': note.neutral_value
+    }
+    return max(note_emotions.items(), key=lambda x: x[1])[0]
+
+def build_advice_prompt(context: Dict) -> str:
+    """
+    Build the advice prompt from a MemoryManager advice context
+    
+    Memories and recent notes (both newest first) are fitted into
+    ADVICE_PROMPT_TOKEN_BUDGET, keeping recent and emotionally intense ones first.
+    """
+    # Memories
+    memory_items = [
+        PromptItem(
+            f"{memory.summary} (dominant: {memory.dominant_emotion})",
+            priority=recency_priority(rank) + (memory.emotional_intensity or 0.0)
+        )
+        for rank, memory in enumerate(context['memories'])
+    ]
+    
+    # Recent notes, labelled with their dominant emotion
+    note_items = [
+        PromptItem(
+            note.content,
+            priority=recency_priority(rank) + note_intensity(note),
+            label=f"[{_dominant_emotion(note)}] "
+        )
+        for rank, note in enumerate(context['recent_notes'])
+    ]
+    
+    return build_budgeted_prompt(
+        head=[
             "You are an empathetic AI counselor. Generate personalized advice (2-3 sentences) based on the user's journal history and current state. Be specific.",
             "",
             f"CURRENT EMOTIONAL STATE: {context['dominant_current_emotion']}",
             ""
-        ]
-        
-        # Add memories for context
-        if context['memories']:
-            prompt_parts.append("MEMORY CONTEXT (past emotional patterns):")
-            for i, memory in enumerate(context['memories'], 1):
-                prompt_parts.append(f"{i}. {memory.summary} (dominant: {memory.dominant_emotion})")
-            prompt_parts.append("")
-        
-        # Add recent notes for immediate context
-        if context['recent_notes']:
-            prompt_parts.append("RECENT NOTES (current situation):")
-            for i, note in enumerate(context['recent_notes'], 1):
-                # Get dominant emotion for this note
-                note_emotions = {
-                    'joy': note.joy_value, 'sadness': note.sadness_value,
-                    'anger': note.anger_value, 'fear': note.fear_value,
-                    'neutral': note.neutral_value
-                }
-                dominant = max(note_emotions.items(), key=lambda x: x[1])[0]
-                
-                prompt_parts.append(f"{i}. [{dominant}] {note.content}")
-            prompt_parts.append("")
-        
-        prompt_parts.extend([
-            "Based on the memory context and recent notes, provide specific supportive advice.",
-        ])
-        
-        prompt = "\n".join(prompt_parts)
-        
-        # Call OpenAI API
-        headers = {
-            "Authorization": f"Bearer {api_token}",
-            "Content-Type": "application/json"
-        }
-        
-        payload = {
-            "model": "gpt-3.5-turbo",
-            "messages": [
-                {
-                    "role": "system",
-                    "content": "You are an empathetic AI counselor who provides personalized advice based on journal analysis and emotional patterns."
-                },
-                {
-                    "role": "user",
-                    "content": prompt
-                }
-            ],
-            "max_tokens": 200,
-            "temperature": 0.8
+        ],
+        sections=[
+            PromptSection(memory_items, title="MEMORY CONTEXT (past emotional patterns):"),
+            PromptSection(note_items, title="RECENT NOTES (current situation):")
+        ],
+        tail=["Based on the memory context and recent notes, provide specific supportive advice."],
+        budget=config.ADVICE_PROMPT_TOKEN_BUDGET
+    )
+
+# Sampling parameters shared by queued and streamed advice
+ADVICE_MAX_TOKENS = 200
+ADVICE_TEMPERATURE = 0.8
+
+def advice_messages(prompt: str) -> List[Dict]:
+    return [
+        {
+            "role": "system",
+            "content": "You are an empathetic AI counselor who provides personalized advice based on journal analysis and emotional patterns."
+        },
+        {
+            "role": "user",
+            "content": prompt
         }
-        
-        response = requests.post(
-            "https://api.openai.com/v1/chat/completions",
-            headers=headers,
-            json=payload,
-            timeout=30
-        )
-        
-        if response.status_code != 200:
-            raise Exception(f"OpenAI API request failed with status {response.status_code}")
-        
-        result = response.json()
-        if "choices" not in result or len(result["choices"]) == 0:
-            raise Exception("Invalid OpenAI API response format")
-        
-        advice_content = result["choices"][0]["message"]["content"].strip()
-        
-        if not advice_content:
-            raise Exception("No advice content generated")
-        
-        # Save advice with context metadata
-        advice = WeeklyAdvice(
-            user_id=user_id,
-            content=advice_content,
-            trigger_type="note_count",
-            memories_used_count=len(context['memories']),
-            recent_notes_used_count=len(context['recent_notes']),
-            dominant_emotion=context['dominant_current_emotion'],
-            notes_analyzed_count=Note.query.filter_by(user_id=user_id).count()
-        )
-        
-        db.session.add(advice)
-        db.session.commit()
-        
-        return advice
-        
-    except Exception as e:
-        print(f"Error generating advice for user {user_id}: {e}")
-        db.session.rollback()
-        raise Exception(f"Failed to generate advice for user {user_id}: {str(e)}")
+    ]
+
+def request_advice(prompt: str, attempt_id: str) -> str:
+    """
+    Call OpenAI for advice on a prompt built by build_advice_prompt
+
+    The completion is cached for `attempt_id` only (the generating task's id),
+    so a retry reuses it but a later generation from unchanged notes and
+    memories gets fresh advice.
+    """
+    advice_content = chat_completion(
+        advice_messages(prompt), max_tokens=ADVICE_MAX_TOKENS, temperature=ADVICE_TEMPERATURE,
+        cache_scope=attempt_id
+    )
+    
+    if not advice_content:
+        raise Exception("No advice content generated")
+    
+    return advice_content
+
+def save_advice(user_id: int, advice_content: str, context: Dict) -> WeeklyAdvice:
+    """Save advice with context metadata and reset the user's advice counter"""
+    counters = get_user_counters(user_id)
+    advice = WeeklyAdvice(
+        user_id=user_id,
+        content=advice_content,
+        trigger_type="note_count",
+        memories_used_count=len(context['memories']),
+        recent_notes_used_count=len(context['recent_notes']),
+        dominant_emotion=context['dominant_current_emotion'],
+        notes_analyzed_count=counters.notes_total if counters else 0
+    )
+    
+    db.session.add(advice)
+    reset_advice_counter(user_id)
+    db.session.commit()
+    bump_user_version(user_id)
+    
+    return advice
     
 
 def should_generate_advice(user_id: int) -> bool:
     """
     Determine if advice should be generated for user
-    Current logic: Every 3 notes since last advice
+    Current logic: Every 3 notes since last advice (first advice after 3 notes)
     """
     try:
-        # Get last advice
-        last_advice = WeeklyAdvice.query.filter_by(user_id=user_id)\
-            .order_by(WeeklyAdvice.created_at.desc()).first()
-        
-        # Get total notes count
-        total_notes = Note.query.filter_by(user_id=user_id).count()
-        
-        if not last_advice:
-            # First advice after 3 notes
-            return total_notes >= 3
-        
-        # Count notes since last advice
-        notes_since_advice = Note.query.filter_by(user_id=user_id)\
-            .filter(Note.created_at > last_advice.created_at).count()
-        
-        return notes_since_advice >= 3
+        # Single primary-key read of the user's counters
+        counters = get_user_counters(user_id)
+        return counters is not None and counters.notes_since_advice >= 3
         
     except Exception as e:
         print(f"Error checking advice eligibility for user {user_id}: {e}")
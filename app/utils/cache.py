@@ -0,0 +1,179 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+
+
+class LRUCache:
+    """
+    Thread-safe in-process LRU cache where every entry carries its own expiry
+    """
+
+    def __init__(self, maxsize: int = 1024, default_ttl: Optional[float] = None):
+        self.maxsize = maxsize
+        self.default_ttl = default_ttl
+        self._data = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        now = time.time()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+
+            expires_at, value = entry
+            if expires_at is not None and expires_at <= now:
+                del self._data[key]
+                self.misses += 1
+                return default
+
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, ttl: Optional[float] = None):
+        ttl = self.default_ttl if ttl is None else ttl
+        if ttl is not None and ttl <= 0:
+            return
+        expires_at = time.time() + ttl if ttl is not None else None
+
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0
+        }
+
+
+class TieredCache:
+    """
+    Two-tier cache: an in-process LRU in front of an optional Redis tier.
+
+    Values must be JSON serializable. The Redis tier is shared by every
+    gunicorn / Celery worker, the LRU tier only lives in the current process.
+    Redis errors are swallowed so a Redis outage degrades to the LRU tier.
+    """
+
+    def __init__(
+        self,
+        namespace: str,
+        maxsize: int = 1024,
+        default_ttl: Optional[float] = None,
+        redis_getter: Optional[Callable[[], Any]] = None
+    ):
+        self.namespace = namespace
+        self.default_ttl = default_ttl
+        self.local = LRUCache(maxsize=maxsize, default_ttl=default_ttl)
+        self._redis_getter = redis_getter
+        self.hits = 0
+        self.misses = 0
+        self.redis_hits = 0
+        self._lock = threading.Lock()
+
+    def _redis(self):
+        if self._redis_getter is None:
+            return None
+        return self._redis_getter()
+
+    def _redis_key(self, key: str) -> str:
+        return f"techtive:{self.namespace}:{key}"
+
+    def _count(self, hit: bool, redis_hit: bool = False):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+            if redis_hit:
+                self.redis_hits += 1
+
+    def get(self, key: str, default=None):
+        value = self.local.get(key)
+        if value is not None:
+            self._count(hit=True)
+            return value
+
+        client = self._redis()
+        if client is not None:
+            try:
+                pipe = client.pipeline()
+                pipe.get(self._redis_key(key))
+                pipe.pttl(self._redis_key(key))
+                raw, pttl = pipe.execute()
+            except Exception as e:
+                print(f"WARNING: {self.namespace} cache Redis read failed: {e}")
+                raw, pttl = None, None
+
+            if raw is not None:
+                value = json.loads(raw)
+                # Backfill the local tier, never beyond the Redis expiry
+                ttl = pttl / 1000.0 if pttl and pttl > 0 else self.default_ttl
+                self.local.set(key, value, ttl=ttl)
+                self._count(hit=True, redis_hit=True)
+                return value
+
+        self._count(hit=False)
+        return default
+
+    def set(self, key: str, value, ttl: Optional[float] = None):
+        ttl = self.default_ttl if ttl is None else ttl
+        if ttl is not None and ttl <= 0:
+            return
+
+        self.local.set(key, value, ttl=ttl)
+
+        client = self._redis()
+        if client is not None:
+            try:
+                client.set(
+                    self._redis_key(key),
+                    json.dumps(value),
+                    px=int(ttl * 1000) if ttl is not None else None
+                )
+            except Exception as e:
+                print(f"WARNING: {self.namespace} cache Redis write failed: {e}")
+
+    def delete(self, key: str):
+        self.local.delete(key)
+
+        client = self._redis()
+        if client is not None:
+            try:
+                client.delete(self._redis_key(key))
+            except Exception as e:
+                print(f"WARNING: {self.namespace} cache Redis delete failed: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "namespace": self.namespace,
+            "local_size": len(self.local),
+            "hits": self.hits,
+            "misses": self.misses,
+            "redis_hits": self.redis_hits,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0
+        }
@@ -0,0 +1,407 @@
+import hashlib
+import os
+import tempfile
+import threading
+import unicodedata
+from abc import ABC, abstractmethod
+import requests
+from typing import Dict, List
+from app.config import config
+from app.extensions import get_redis_client
+from app.utils.api_utils import call_hf_emotion_api_batch
+from app.utils.cache import TieredCache
+
+# A prediction is the model's full label distribution: [{"label": "joy", "score": 0.93}, ...]
+Prediction = List[Dict]
+
+
+class EmotionBackend(ABC):
+    """
+    Interface for emotion classifiers used by the emotion analysis tasks
+
+    `model_id` identifies the exact model behind the backend, so anything keyed
+    on it (e.g. cached scores) changes when the model does.
+    """
+
+    model_id = None
+
+    @abstractmethod
+    def score(self, texts: List[str]) -> List[Prediction]:
+        """Score every text, returning one prediction per text in the same order"""
+
+
+class HuggingFaceAPIBackend(EmotionBackend):
+    """Hosted Hugging Face Inference API (one HTTP request per batch, using list `inputs`)"""
+
+    def __init__(self, api_url: str):
+        self.api_url = api_url
+        self.model_id = f"hf_api:{api_url}"
+
+    def score(self, texts: List[str]) -> List[Prediction]:
+        return call_hf_emotion_api_batch(texts) if texts else []
+
+
+class LocalTransformersBackend(EmotionBackend):
+    """
+    In-process CPU inference with transformers/torch
+
+    The model loads once per process on first use. Texts are tokenized in
+    padded batches and run under `torch.inference_mode`. `model_path` can be a
+    Hub model name or a local directory, e.g. a tiny randomly initialized
+    model saved with `save_pretrained` for tests.
+
+    `runtime` selects the CPU inference path:
+        torch: fp32 PyTorch
+        int8: PyTorch with dynamic int8 quantization of the Linear layers
+        onnx: ONNX Runtime on a one-time export of the model (needs `onnxruntime`)
+    `num_threads` caps intra-op threads so several workers can share a box.
+    """
+
+    RUNTIMES = ("torch", "int8", "onnx")
+
+    def __init__(self, model_path: str, batch_size: int = 16, max_length: int = 512,
+                 runtime: str = "torch", num_threads: int = None, onnx_path: str = None):
+        if runtime not in self.RUNTIMES:
+            raise ValueError(f"Unknown emotion runtime: {runtime}")
+        self.model_path = model_path
+        self.batch_size = batch_size
+        self.max_length = max_length
+        self.runtime = runtime
+        self.num_threads = num_threads
+        self.onnx_path = onnx_path or self._default_onnx_path(model_path)
+        # Quantized/ONNX scores differ slightly from fp32, so they get their own cache keys
+        self.model_id = f"local:{model_path}@{self._model_version(model_path)}:{runtime}"
+        self.tokenizer = None
+        self.model = None
+        self.session = None
+        self.id2label = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _model_version(model_path: str) -> str:
+        """Changes whenever a local model directory is replaced"""
+        config_file = os.path.join(model_path, "config.json")
+        if os.path.exists(config_file):
+            return str(int(os.path.getmtime(config_file)))
+        return "hub"
+
+    @classmethod
+    def _default_onnx_path(cls, model_path: str) -> str:
+        # Versioned so a stale export isn't reused after the model directory is replaced
+        version = cls._model_version(model_path)
+        if os.path.isdir(model_path):
+            return os.path.join(model_path, f"model-{version}.onnx")
+        return os.path.join(tempfile.gettempdir(), f"{model_path.replace('/', '--')}-{version}.onnx")
+
+    def load(self):
+        if self.model is not None or self.session is not None:
+            return
+
+        with self._lock:
+            if self.model is not None or self.session is not None:
+                return
+
+            import torch
+            from transformers import AutoModelForSequenceClassification, AutoTokenizer
+
+            if self.num_threads:
+                torch.set_num_threads(self.num_threads)
+
+            print(f"Loading emotion model from {self.model_path} ({self.runtime})")
+            self.tokenizer = AutoTokenizer.from_pretrained(self.model_path)
+
+            if self.runtime == "onnx":
+                self.session, self.id2label = self._load_onnx_session()
+                return
+
+            model = AutoModelForSequenceClassification.from_pretrained(self.model_path)
+            model.eval()
+            if self.runtime == "int8":
+                model = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+            self.id2label = model.config.id2label
+            self.model = model
+
+    def _load_onnx_session(self):
+        try:
+            import onnxruntime
+        except ImportError:
+            raise RuntimeError("The onnx emotion runtime requires the onnxruntime package (pip install onnxruntime)")
+        import torch
+        from transformers import AutoModelForSequenceClassification
+
+        model = AutoModelForSequenceClassification.from_pretrained(self.model_path)
+        model.eval()
+        id2label = model.config.id2label
+
+        if not os.path.exists(self.onnx_path):
+            print(f"Exporting emotion model to {self.onnx_path}")
+            sample = self.tokenizer(["export"], return_tensors="pt")
+            # Export next to the target and rename, so concurrent workers never load a partial file
+            partial_path = f"{self.onnx_path}.{os.getpid()}.partial"
+            torch.onnx.export(
+                model,
+                (sample["input_ids"], sample["attention_mask"]),
+                partial_path,
+                input_names=["input_ids", "attention_mask"],
+                output_names=["logits"],
+                dynamic_axes={
+                    "input_ids": {0: "batch", 1: "sequence"},
+                    "attention_mask": {0: "batch", 1: "sequence"},
+                    "logits": {0: "batch"}
+                },
+                opset_version=14
+            )
+            os.replace(partial_path, self.onnx_path)
+        del model
+
+        options = onnxruntime.SessionOptions()
+        if self.num_threads:
+            options.intra_op_num_threads = self.num_threads
+        session = onnxruntime.InferenceSession(self.onnx_path, options, providers=["CPUExecutionProvider"])
+        return session, id2label
+
+    def _probabilities(self, batch: List[str]) -> List[List[float]]:
+        if self.session is not None:
+            import numpy as np
+
+            inputs = self.tokenizer(batch, padding=True, truncation=True, max_length=self.max_length, return_tensors="np")
+            logits = self.session.run(["logits"], {
+                "input_ids": inputs["input_ids"].astype(np.int64),
+                "attention_mask": inputs["attention_mask"].astype(np.int64)
+            })[0]
+            exp = np.exp(logits - logits.max(axis=-1, keepdims=True))
+            return (exp / exp.sum(axis=-1, keepdims=True)).tolist()
+
+        import torch
+
+        inputs = self.tokenizer(batch, padding=True, truncation=True, max_length=self.max_length, return_tensors="pt")
+        with torch.inference_mode():
+            return torch.softmax(self.model(**inputs).logits, dim=-1).tolist()
+
+    def score(self, texts: List[str]) -> List[Prediction]:
+        self.load()
+        predictions = []
+
+        for start in range(0, len(texts), self.batch_size):
+            for row in self._probabilities(texts[start:start + self.batch_size]):
+                predictions.append([
+                    {"label": self.id2label[i], "score": score} for i, score in enumerate(row)
+                ])
+
+        return predictions
+
+
+class InferenceServerBackend(EmotionBackend):
+    """
+    Client for the shared local inference server (`flask emotion-server`)
+
+    Every worker process on a host talks to one server holding one copy of the
+    model, and the server batches their requests together. `model_id` is what
+    this process expects the server to run; a server reporting a different
+    model is treated as an error so its scores never land in the cache under
+    the wrong key.
+    """
+
+    def __init__(self, server_url: str, model_id: str, timeout: float = 30):
+        self.server_url = server_url.rstrip("/")
+        self.model_id = model_id
+        self.timeout = timeout
+        self._session = None
+        self._session_pid = None
+
+    @property
+    def session(self):
+        # Connection pools must not be shared across forked workers
+        if self._session is None or self._session_pid != os.getpid():
+            self._session = requests.Session()
+            self._session_pid = os.getpid()
+        return self._session
+
+    def score(self, texts: List[str]) -> List[Prediction]:
+        if not texts:
+            return []
+
+        response = self.session.post(f"{self.server_url}/score", json={"texts": texts}, timeout=self.timeout)
+        if response.status_code != 200:
+            raise Exception(f"Emotion server request failed with status {response.status_code}: {response.text[:200]}")
+
+        body = response.json()
+        if body.get("model_id") != self.model_id:
+            raise Exception(f"Emotion server runs {body.get('model_id')}, expected {self.model_id}")
+        if len(body["predictions"]) != len(texts):
+            raise Exception(f"Emotion server returned {len(body['predictions'])} predictions for {len(texts)} texts")
+        return body["predictions"]
+
+
+class ChunkingEmotionBackend(EmotionBackend):
+    """
+    Scores long notes as overlapping token windows instead of one truncated input
+
+    Texts are split with the model's fast tokenizer (`tokenizers`) into windows
+    of `window_tokens` tokens overlapping by `overlap_tokens`. All windows of
+    all texts go to the wrapped backend in a single call, and each text's
+    prediction is the token-count weighted average of its windows.
+    """
+
+    def __init__(self, backend: EmotionBackend, tokenizer_path: str, window_tokens: int = 510, overlap_tokens: int = 64):
+        if overlap_tokens >= window_tokens:
+            raise ValueError("Window overlap must be smaller than the window size")
+        self.backend = backend
+        self.tokenizer_path = tokenizer_path
+        self.window_tokens = window_tokens
+        self.overlap_tokens = overlap_tokens
+        self.model_id = f"{backend.model_id}|windows:{window_tokens}/{overlap_tokens}"
+        self._tokenizer = None
+        self._lock = threading.Lock()
+
+    @property
+    def tokenizer(self):
+        if self._tokenizer is None:
+            with self._lock:
+                if self._tokenizer is None:
+                    tokenizer_file = os.path.join(self.tokenizer_path, "tokenizer.json")
+                    if os.path.exists(tokenizer_file):
+                        from tokenizers import Tokenizer
+                        self._tokenizer = Tokenizer.from_file(tokenizer_file)
+                    else:
+                        # Hub models may only ship vocab/merges; the fast tokenizer wraps a `tokenizers.Tokenizer`
+                        from transformers import AutoTokenizer
+                        self._tokenizer = AutoTokenizer.from_pretrained(self.tokenizer_path, use_fast=True).backend_tokenizer
+                    # Windows need the full token sequence
+                    self._tokenizer.no_truncation()
+        return self._tokenizer
+
+    def split(self, text: str) -> List[tuple]:
+        """Split text into (window_text, token_count) pairs covering all of it"""
+        offsets = self.tokenizer.encode(text, add_special_tokens=False).offsets
+        if len(offsets) <= self.window_tokens:
+            return [(text, max(len(offsets), 1))]
+
+        windows = []
+        step = self.window_tokens - self.overlap_tokens
+        for start in range(0, len(offsets), step):
+            end = min(start + self.window_tokens, len(offsets))
+            windows.append((text[offsets[start][0]:offsets[end - 1][1]], end - start))
+            if end == len(offsets):
+                break
+        return windows
+
+    def score(self, texts: List[str]) -> List[Prediction]:
+        windows = [self.split(text) for text in texts]
+        flat = [window_text for text_windows in windows for window_text, _ in text_windows]
+        flat_predictions = iter(self.backend.score(flat))
+
+        predictions = []
+        for text_windows in windows:
+            if len(text_windows) == 1:
+                predictions.append(next(flat_predictions))
+                continue
+
+            total_tokens = sum(tokens for _, tokens in text_windows)
+            combined = {}
+            for _, tokens in text_windows:
+                for emotion in next(flat_predictions):
+                    combined[emotion["label"]] = combined.get(emotion["label"], 0.0) + emotion["score"] * tokens / total_tokens
+            predictions.append([{"label": label, "score": score} for label, score in combined.items()])
+
+        return predictions
+
+
+class CachedEmotionBackend(EmotionBackend):
+    """
+    Content-hash score cache in front of another backend
+
+    Keys hash the normalized text together with the wrapped backend's
+    `model_id`, so switching models never serves stale scores. Repeated texts
+    within one call are only scored once.
+    """
+
+    def __init__(self, backend: EmotionBackend, cache: TieredCache):
+        self.backend = backend
+        self.cache = cache
+        self.model_id = backend.model_id
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        return " ".join(unicodedata.normalize("NFC", text).split())
+
+    def cache_key(self, text: str) -> str:
+        return hashlib.sha256(f"{self.model_id}\n{self.normalize(text)}".encode("utf-8")).hexdigest()
+
+    def score(self, texts: List[str]) -> List[Prediction]:
+        keys = [self.cache_key(text) for text in texts]
+        predictions = [self.cache.get(key) for key in keys]
+
+        # Score each distinct missing text once
+        missing = {}
+        for key, text, prediction in zip(keys, texts, predictions):
+            if prediction is None and key not in missing:
+                missing[key] = text
+
+        if missing:
+            scored = dict(zip(missing, self.backend.score(list(missing.values()))))
+            for key, prediction in scored.items():
+                self.cache.set(key, prediction)
+            predictions = [p if p is not None else scored[key] for key, p in zip(keys, predictions)]
+
+        return predictions
+
+
+def create_base_emotion_backend(name: str = None, runtime: str = None) -> EmotionBackend:
+    """Build the bare backend selected by EMOTION_BACKEND (or `name`)"""
+    name = name or config.EMOTION_BACKEND
+    if name == "local":
+        return LocalTransformersBackend(
+            config.EMOTION_MODEL_PATH,
+            batch_size=config.EMOTION_BATCH_SIZE,
+            max_length=config.EMOTION_MAX_LENGTH,
+            runtime=runtime or config.EMOTION_RUNTIME,
+            num_threads=config.EMOTION_INTRA_OP_THREADS,
+            onnx_path=config.EMOTION_ONNX_PATH
+        )
+    if name == "server":
+        # The server runs the same local model this config describes, so scores share cache keys with it
+        local = create_base_emotion_backend("local", runtime=runtime)
+        return InferenceServerBackend(config.EMOTION_SERVER_URL, local.model_id, timeout=config.EMOTION_SERVER_TIMEOUT)
+    if name == "hf_api":
+        return HuggingFaceAPIBackend(config.HUGGING_FACE_MODEL_URL)
+    raise ValueError(f"Unknown EMOTION_BACKEND: {name}")
+
+
+def create_emotion_backend() -> EmotionBackend:
+    """Build the configured backend, wrapped in chunking and the score cache if enabled"""
+    backend = create_base_emotion_backend()
+
+    if config.EMOTION_CHUNKING_ENABLED:
+        backend = ChunkingEmotionBackend(
+            backend,
+            config.EMOTION_MODEL_PATH,
+            window_tokens=config.EMOTION_WINDOW_TOKENS,
+            overlap_tokens=config.EMOTION_WINDOW_OVERLAP
+        )
+
+    if config.EMOTION_CACHE_ENABLED:
+        backend = CachedEmotionBackend(backend, emotion_score_cache)
+
+    return backend
+
+
+# Shared by every backend so hit rates survive backend re-creation
+emotion_score_cache = TieredCache(
+    "emotion:scores",
+    maxsize=config.EMOTION_CACHE_SIZE,
+    default_ttl=config.EMOTION_CACHE_TTL,
+    redis_getter=get_redis_client if config.EMOTION_CACHE_REDIS else None
+)
+
+# One backend (and so one loaded model) per worker process
+_backend = None
+_backend_pid = None
+
+
+def get_emotion_backend() -> EmotionBackend:
+    global _backend, _backend_pid
+    if _backend is None or _backend_pid != os.getpid():
+        _backend = create_emotion_backend()
+        _backend_pid = os.getpid()
+    return _backend
@@ -0,0 +1,133 @@
+import json
+import time
+import uuid
+from typing import Dict, List
+from redis.exceptions import TimeoutError as RedisTimeoutError
+from app.config import config
+from app.extensions import get_blocking_redis_client, get_redis_client
+from app.utils.emotion_backends import get_emotion_backend
+from app.utils.emotion_scores import parse_emotion_scores, preview, write_emotion_scores
+from app.utils.redis_lock import RedisLock
+
+PENDING_KEY = "techtive:emotion:pending"
+LEADER_KEY = "techtive:emotion:leader"
+RESULT_KEY = "techtive:emotion:result:{item_id}"
+
+# Results are picked up within seconds; the TTL only cleans up after crashed waiters
+RESULT_TTL_SECONDS = 600
+
+
+def score_and_write(items: List[Dict]) -> Dict[str, Dict]:
+    """
+    Score many pending notes with one backend call and write them back with one UPDATE
+
+    Returns a result per item id, shaped like send_note's task result.
+    On a scoring failure every item gets an "error" result so each task can retry.
+    """
+    try:
+        predictions = get_emotion_backend().score([item["content"] for item in items])
+        scores = {item["note_id"]: parse_emotion_scores(p) for item, p in zip(items, predictions)}
+        statuses = write_emotion_scores(
+            scores, {item["note_id"]: item.get("content_hash") for item in items}
+        )
+    except Exception as e:
+        return {
+            item["id"]: {
+                "note_id": item["note_id"],
+                "content": preview(item["content"]),
+                "status": "error",
+                "error_message": str(e)
+            }
+            for item in items
+        }
+
+    results = {}
+    for item in items:
+        status = statuses.get(item["note_id"], "not_found")
+        result = {"note_id": item["note_id"], "content": preview(item["content"]), "status": status}
+        if status == "success":
+            result["all_emotions"] = scores[item["note_id"]]
+        elif status == "not_found":
+            result["status"] = "error"
+            result["error_message"] = f"Note with ID {item['note_id']} not found"
+        results[item["id"]] = result
+    return results
+
+
+class EmotionBatcher:
+    """
+    Gathers concurrent send_note tasks into micro-batches through Redis
+
+    Every task pushes its note onto a shared pending list. Whichever task holds
+    the leader lock waits up to `window` seconds (or until `max_items` are
+    pending), drains one batch, scores it in a single backend call and bulk
+    writes the scores. Results are handed back to each waiting task on its own
+    Redis list, so every task still returns (or retries) its own note.
+    """
+
+    def __init__(self, window: float, max_items: int, wait_timeout: float):
+        self.window = window
+        self.max_items = max_items
+        self.wait_timeout = wait_timeout
+
+    def submit(self, note_id: int, content: str, content_hash: str = None) -> Dict:
+        item = {"id": uuid.uuid4().hex, "note_id": note_id, "content": content, "content_hash": content_hash}
+
+        client = get_redis_client()
+        # BLPOP blocks longer than the shared client's socket timeout allows
+        blocking_client = get_blocking_redis_client()
+        if client is None or blocking_client is None:
+            # No shared queue available: score this note on its own
+            return score_and_write([item])[item["id"]]
+
+        client.rpush(PENDING_KEY, json.dumps(item))
+        result_key = RESULT_KEY.format(item_id=item["id"])
+        deadline = time.time() + self.wait_timeout
+
+        while time.time() < deadline:
+            leader = RedisLock(client, LEADER_KEY, lease_seconds=self.wait_timeout)
+            if leader.acquire():
+                try:
+                    self._run_batch(client)
+                finally:
+                    leader.release()
+
+            try:
+                popped = blocking_client.blpop(result_key, timeout=1)
+            except RedisTimeoutError:
+                continue
+            if popped is not None:
+                return json.loads(popped[1])
+
+        raise Exception(f"Timeout waiting for batched emotion analysis of note {note_id}")
+
+    def _run_batch(self, client):
+        # Let the batch fill up for at most one window
+        started = time.time()
+        while time.time() - started < self.window and client.llen(PENDING_KEY) < self.max_items:
+            time.sleep(0.01)
+
+        pipe = client.pipeline()
+        pipe.lrange(PENDING_KEY, 0, self.max_items - 1)
+        pipe.ltrim(PENDING_KEY, self.max_items, -1)
+        raw_items, _ = pipe.execute()
+        if not raw_items:
+            return
+
+        items = [json.loads(raw) for raw in raw_items]
+        results = score_and_write(items)
+        print(f"Scored micro-batch of {len(items)} notes")
+
+        pipe = client.pipeline()
+        for item_id, result in results.items():
+            key = RESULT_KEY.format(item_id=item_id)
+            pipe.rpush(key, json.dumps(result))
+            pipe.expire(key, RESULT_TTL_SECONDS)
+        pipe.execute()
+
+
+emotion_batcher = EmotionBatcher(
+    window=config.EMOTION_MICRO_BATCH_WINDOW,
+    max_items=config.EMOTION_MICRO_BATCH_SIZE,
+    wait_timeout=config.EMOTION_MICRO_BATCH_TIMEOUT
+)
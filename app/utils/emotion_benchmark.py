@@ -0,0 +1,149 @@
+import json
+import multiprocessing
+import queue as queue_module
+import resource
+import time
+from typing import Dict, List, Optional
+
+
+def load_samples(path: str, limit: Optional[int] = None) -> List[Dict]:
+    """
+    Read benchmark notes from a JSONL file
+
+    Each line is {"content": "...", "label": "joy"}; `label` is optional and
+    enables the accuracy column (share of notes whose top emotion matches it).
+    """
+    samples = []
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                samples.append(json.loads(line))
+            if limit and len(samples) >= limit:
+                break
+    return samples
+
+
+def _percentile(values: List[float], percentile: float) -> float:
+    ordered = sorted(values)
+    index = min(int(round(percentile / 100 * (len(ordered) - 1))), len(ordered) - 1)
+    return ordered[index]
+
+
+def _top_label(prediction: List[Dict]) -> str:
+    return max(prediction, key=lambda emotion: emotion["score"])["label"].lower()
+
+
+def benchmark_backend(backend, samples: List[Dict], warmup: int = 3) -> Dict:
+    """
+    Score every sample one note at a time and report latency, throughput and accuracy
+
+    RSS is the process's peak resident set size, so run one backend per process
+    when comparing memory.
+    """
+    texts = [sample["content"] for sample in samples]
+
+    # Load models / open connections outside the measured loop
+    for text in texts[:warmup]:
+        backend.score([text])
+
+    latencies, predictions = [], []
+    started = time.perf_counter()
+    for text in texts:
+        note_started = time.perf_counter()
+        predictions.append(backend.score([text])[0])
+        latencies.append(time.perf_counter() - note_started)
+    elapsed = time.perf_counter() - started
+
+    labeled = [(sample["label"].lower(), prediction) for sample, prediction in zip(samples, predictions) if sample.get("label")]
+    accuracy = None
+    if labeled:
+        accuracy = sum(label == _top_label(prediction) for label, prediction in labeled) / len(labeled)
+
+    return {
+        "notes": len(texts),
+        "notes_per_sec": round(len(texts) / elapsed, 2) if elapsed else None,
+        "p50_ms": round(_percentile(latencies, 50) * 1000, 1),
+        "p95_ms": round(_percentile(latencies, 95) * 1000, 1),
+        "p99_ms": round(_percentile(latencies, 99) * 1000, 1),
+        "max_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "accuracy": round(accuracy, 4) if accuracy is not None else None,
+        "top_labels": [_top_label(prediction) for prediction in predictions]
+    }
+
+
+def _add_agreement(results: Dict[str, Dict]):
+    """Replace each result's top labels with how often they agree with the first result's"""
+    baseline = next(iter(results.values()))["top_labels"]
+    for metrics in results.values():
+        agreement = sum(a == b for a, b in zip(baseline, metrics["top_labels"])) / len(baseline) if baseline else None
+        metrics["agreement_with_first"] = round(agreement, 4) if agreement is not None else None
+        del metrics["top_labels"]
+
+
+def compare_backends(backends: Dict, samples: List[Dict]) -> Dict[str, Dict]:
+    """Benchmark each named backend and add how often its top label agrees with the first one"""
+    results = {name: benchmark_backend(backend, samples) for name, backend in backends.items()}
+    _add_agreement(results)
+    return results
+
+
+def _benchmark_runtime_in_child(backend_kwargs: Dict, samples: List[Dict], queue):
+    from app.utils.emotion_backends import LocalTransformersBackend
+
+    try:
+        queue.put(benchmark_backend(LocalTransformersBackend(**backend_kwargs), samples))
+    except Exception as e:
+        queue.put({"error": str(e)})
+
+
+def _wait_for_child_result(child, queue, timeout: float) -> Dict:
+    """
+    Read the child's result, polling so a crashed or stuck child can't hang the benchmark
+
+    Reports an error result when the child exits without one (e.g. killed by
+    the OOM killer) or runs longer than `timeout` seconds.
+    """
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            return queue.get(timeout=1)
+        except queue_module.Empty:
+            if not child.is_alive():
+                # The result may have landed just before the child exited
+                try:
+                    return queue.get(timeout=1)
+                except queue_module.Empty:
+                    return {"error": f"Benchmark process exited with code {child.exitcode} without a result"}
+
+    child.terminate()
+    return {"error": f"Benchmark process did not finish within {timeout}s"}
+
+
+def compare_runtimes(runtimes: List[str], samples: List[Dict], timeout: float = 3600,
+                     **backend_kwargs) -> Dict[str, Dict]:
+    """
+    Benchmark LocalTransformersBackend once per runtime, each in a fresh process
+
+    A spawned child per runtime keeps peak RSS and torch's thread pool from
+    leaking between runs. `backend_kwargs` are passed to every backend
+    (model_path, batch_size, num_threads, ...). A runtime whose child crashes
+    or exceeds `timeout` seconds is reported as an error.
+    """
+    context = multiprocessing.get_context("spawn")
+    results = {}
+    for runtime in runtimes:
+        queue = context.Queue()
+        child = context.Process(
+            target=_benchmark_runtime_in_child,
+            args=({**backend_kwargs, "runtime": runtime}, samples, queue)
+        )
+        child.start()
+        # Read before join so a large result can't block the child on a full pipe
+        results[runtime] = _wait_for_child_result(child, queue, timeout)
+        child.join()
+
+    failed = {runtime: result for runtime, result in results.items() if "error" in result}
+    scored = {runtime: result for runtime, result in results.items() if "error" not in result}
+    if scored:
+        _add_agreement(scored)
+    return {runtime: failed.get(runtime) or scored[runtime] for runtime in runtimes}
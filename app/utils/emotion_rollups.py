@@ -0,0 +1,140 @@
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from app.extensions import db
+from app.models.user_emotion_rollup import UserEmotionRollup
+from app.utils.emotion_scores import EMOTION_ORDER
+
+GRANULARITIES = ("day", "week")
+SUM_COLUMNS = [f"{emotion}_sum" for emotion in EMOTION_ORDER]
+
+# (user_id, note created_at, scores before, scores after); None means "no scores"
+RollupChange = Tuple[int, datetime, Optional[Dict[str, float]], Optional[Dict[str, float]]]
+
+
+def note_emotion_values(note) -> Dict[str, float]:
+    """Emotion scores of a Note (or a row selecting its <emotion>_value columns)"""
+    return {emotion: getattr(note, f"{emotion}_value") or 0.0 for emotion in EMOTION_ORDER}
+
+
+def _is_scored(scores: Optional[Dict[str, float]]) -> bool:
+    # Unscored notes keep the all-zero column defaults; scored ones sum to ~1
+    return bool(scores) and sum(scores.values()) > 0
+
+
+def bucket_start(created_at: datetime, granularity: str) -> date:
+    day = created_at.astimezone(timezone.utc).date() if created_at.tzinfo else created_at.date()
+    if granularity == "week":
+        return day - timedelta(days=day.weekday())
+    return day
+
+
+def record_rollup_changes(changes: Iterable[RollupChange]):
+    """
+    Add the difference between each note's old and new scores to its day and week buckets
+
+    Runs in the caller's transaction (nothing is committed here), so rollups
+    only move together with the note rows. Callers must hold the note rows
+    (e.g. SELECT ... FOR UPDATE) so concurrent writers can't count a change twice.
+    """
+    deltas = {}
+    for user_id, created_at, old_scores, new_scores in changes:
+        if created_at is None:
+            continue
+        old = old_scores if _is_scored(old_scores) else {}
+        new = new_scores if _is_scored(new_scores) else {}
+        count_delta = int(bool(new)) - int(bool(old))
+        sum_deltas = [new.get(emotion, 0.0) - old.get(emotion, 0.0) for emotion in EMOTION_ORDER]
+        if count_delta == 0 and not any(sum_deltas):
+            continue
+
+        for granularity in GRANULARITIES:
+            key = (user_id, granularity, bucket_start(created_at, granularity))
+            totals = deltas.setdefault(key, [0] + [0.0] * len(SUM_COLUMNS))
+            totals[0] += count_delta
+            for i, delta in enumerate(sum_deltas, start=1):
+                totals[i] += delta
+
+    if not deltas:
+        return
+
+    # Upsert in key order so concurrent writers lock rollup rows in the same order and can't deadlock
+    rows = [
+        {"user_id": user_id, "granularity": granularity, "bucket_start": start,
+         "note_count": totals[0], **dict(zip(SUM_COLUMNS, totals[1:]))}
+        for (user_id, granularity, start), totals in sorted(deltas.items(), key=lambda item: item[0])
+    ]
+    stmt = pg_insert(UserEmotionRollup).values(rows)
+    db.session.execute(stmt.on_conflict_do_update(
+        index_elements=[UserEmotionRollup.user_id, UserEmotionRollup.granularity, UserEmotionRollup.bucket_start],
+        set_={
+            "note_count": UserEmotionRollup.note_count + stmt.excluded.note_count,
+            **{name: getattr(UserEmotionRollup, name) + stmt.excluded[name] for name in SUM_COLUMNS},
+            "updated_at": db.func.now()
+        }
+    ))
+
+
+def load_rollups(user_id: int, granularity: str, start: Optional[date] = None, end: Optional[date] = None) -> List:
+    """Non-empty buckets for a user, oldest first"""
+    stmt = select(
+        UserEmotionRollup.bucket_start,
+        UserEmotionRollup.note_count,
+        *[getattr(UserEmotionRollup, name) for name in SUM_COLUMNS]
+    ).where(
+        UserEmotionRollup.user_id == user_id,
+        UserEmotionRollup.granularity == granularity,
+        UserEmotionRollup.note_count > 0
+    )
+    if start is not None:
+        stmt = stmt.where(UserEmotionRollup.bucket_start >= start)
+    if end is not None:
+        stmt = stmt.where(UserEmotionRollup.bucket_start <= end)
+    return db.session.execute(stmt.order_by(UserEmotionRollup.bucket_start)).all()
+
+
+def _point(bucket: date, note_count: int, sums: List[float]) -> Dict:
+    return {
+        "bucket_start": bucket.isoformat(),
+        "note_count": note_count,
+        "averages": {
+            emotion: round(total / note_count, 4) if note_count else None
+            for emotion, total in zip(EMOTION_ORDER, sums)
+        }
+    }
+
+
+def trend_series(rows: List) -> List[Dict]:
+    return [_point(row.bucket_start, row.note_count, [getattr(row, name) for name in SUM_COLUMNS]) for row in rows]
+
+
+def resampled_trend_series(rows: List, rule: str) -> List[Dict]:
+    """
+    Re-bucket rollups with a pandas offset alias (e.g. "MS", "2W-MON", "QS")
+
+    Counts and sums are summed per new bucket and the averages divided in one
+    vectorized step, so the result is exact rather than an average of averages.
+    Raises ValueError for an invalid rule.
+    """
+    import pandas as pd
+
+    if not rows:
+        return []
+    frame = pd.DataFrame(
+        [(row.bucket_start, row.note_count, *[getattr(row, name) for name in SUM_COLUMNS]) for row in rows],
+        columns=["bucket_start", "note_count", *SUM_COLUMNS]
+    )
+    frame["bucket_start"] = pd.to_datetime(frame["bucket_start"])
+    totals = frame.set_index("bucket_start").resample(rule).sum()
+    totals = totals[totals["note_count"] > 0]
+    averages = totals[SUM_COLUMNS].div(totals["note_count"], axis=0).round(4)
+
+    return [
+        {
+            "bucket_start": bucket.date().isoformat(),
+            "note_count": int(note_count),
+            "averages": {emotion: float(averages.at[bucket, name]) for emotion, name in zip(EMOTION_ORDER, SUM_COLUMNS)}
+        }
+        for bucket, note_count in totals["note_count"].items()
+    ]
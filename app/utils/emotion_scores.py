@@ -0,0 +1,119 @@
+import hashlib
+from typing import Dict, Optional
+from sqlalchemy import Float, Integer, column, select, update, values
+from app.models.note import Note
+from app.extensions import db
+from app.utils.versioning import bump_user_version
+
+# Supported emotions to prevent API changes from breaking the model
+SUPPORTED_EMOTIONS = {
+    "anger",
+    "disgust", 
+    "fear",
+    "joy",
+    "neutral",
+    "sadness",
+    "surprise",
+}
+
+def note_content_hash(content):
+    """Stable hash of a note's text, used to detect unchanged and superseded content"""
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+def preview(content):
+    return content[:100] + "..." if len(content) > 100 else content
+
+def superseded_result(note_id, content):
+    return {
+        "note_id": note_id,
+        "content": preview(content),
+        "status": "superseded"
+    }
+
+def parse_emotion_scores(emotion_data):
+    """Turn a list of {label, score} predictions into a score for every supported emotion"""
+    emotion_scores = {}
+    if emotion_data:
+        for category in emotion_data:
+            emotion = category["label"].lower()
+            score = round(float(category["score"]), 3)
+            if emotion in SUPPORTED_EMOTIONS:
+                emotion_scores[emotion] = score
+    
+    # Ensure we have all required emotions
+    for emotion in SUPPORTED_EMOTIONS:
+        if emotion not in emotion_scores:
+            emotion_scores[emotion] = 0.0
+    
+    return emotion_scores
+
+def apply_emotion_scores(note, emotion_scores):
+    """Map emotion scores to the note's database fields"""
+    note.anger_value = emotion_scores.get('anger', 0.0)
+    note.disgust_value = emotion_scores.get('disgust', 0.0)
+    note.fear_value = emotion_scores.get('fear', 0.0)
+    note.joy_value = emotion_scores.get('joy', 0.0)
+    note.neutral_value = emotion_scores.get('neutral', 0.0)
+    note.sadness_value = emotion_scores.get('sadness', 0.0)
+    note.surprise_value = emotion_scores.get('surprise', 0.0)
+
+# Note columns holding each emotion's score, sorted by emotion name
+EMOTION_ORDER = sorted(SUPPORTED_EMOTIONS)
+EMOTION_COLUMNS = [f"{emotion}_value" for emotion in EMOTION_ORDER]
+
+def write_emotion_scores(scores_by_note: Dict[int, Dict[str, float]], content_hashes: Optional[Dict[int, str]] = None) -> Dict[int, str]:
+    """
+    Write emotion scores for many notes with a single UPDATE ... FROM (VALUES ...) and commit
+    
+    Notes whose content no longer matches the hash it was scored from are skipped.
+    The users' emotion rollups are adjusted in the same transaction.
+    
+    Returns:
+        dict: note_id -> "success", "superseded" or "not_found"
+    """
+    if not scores_by_note:
+        return {}
+    
+    from app.utils.emotion_rollups import note_emotion_values, record_rollup_changes
+    
+    content_hashes = content_hashes or {}
+    statuses = {note_id: "not_found" for note_id in scores_by_note}
+    # Lock the rows so the rollup deltas below are computed from the scores actually replaced
+    rows = db.session.execute(
+        select(Note.id, Note.user_id, Note.content, Note.created_at, *[getattr(Note, name) for name in EMOTION_COLUMNS])
+        .where(Note.id.in_(list(scores_by_note)))
+        .order_by(Note.id)
+        .with_for_update()
+    ).all()
+    
+    to_write, rollup_changes, user_ids = [], [], set()
+    for row in rows:
+        expected_hash = content_hashes.get(row.id)
+        if expected_hash is not None and note_content_hash(row.content) != expected_hash:
+            statuses[row.id] = "superseded"
+            continue
+        
+        scores = scores_by_note[row.id]
+        to_write.append((row.id, *[scores.get(emotion, 0.0) for emotion in EMOTION_ORDER]))
+        rollup_changes.append((row.user_id, row.created_at, note_emotion_values(row), scores))
+        statuses[row.id] = "success"
+        user_ids.add(row.user_id)
+    
+    if to_write:
+        scores_table = values(
+            column("id", Integer), *[column(name, Float) for name in EMOTION_COLUMNS],
+            name="scores"
+        ).data(to_write)
+        db.session.execute(
+            update(Note).where(Note.id == scores_table.c.id)
+            .values({name: scores_table.c[name] for name in EMOTION_COLUMNS}),
+            execution_options={"synchronize_session": False}
+        )
+        record_rollup_changes(rollup_changes)
+    
+    db.session.commit()
+    
+    for user_id in user_ids:
+        bump_user_version(user_id)
+    
+    return statuses
@@ -0,0 +1,125 @@
+import json
+import queue
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List
+from app.utils.emotion_backends import EmotionBackend, Prediction
+
+
+class _PendingRequest:
+    def __init__(self, texts: List[str]):
+        self.texts = texts
+        self.predictions = None
+        self.error = None
+        self.done = threading.Event()
+
+
+class DynamicBatcher:
+    """
+    Merges concurrent score requests into one backend call
+
+    A single thread owns the model. It takes the first waiting request, then
+    keeps collecting requests until `max_batch_size` texts are gathered or
+    `max_wait` seconds have passed, scores them together and hands each
+    request its slice of the predictions.
+    """
+
+    def __init__(self, backend: EmotionBackend, max_batch_size: int = 32, max_wait: float = 0.01):
+        self.backend = backend
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="emotion-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, texts: List[str]) -> List[Prediction]:
+        pending = _PendingRequest(texts)
+        self._queue.put(pending)
+        pending.done.wait()
+        if pending.error is not None:
+            raise pending.error
+        return pending.predictions
+
+    def _collect(self) -> List[_PendingRequest]:
+        batch = [self._queue.get()]
+        size = len(batch[0].texts)
+        deadline = time.monotonic() + self.max_wait
+
+        while size < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                pending = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            batch.append(pending)
+            size += len(pending.texts)
+
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            try:
+                predictions = self.backend.score([text for pending in batch for text in pending.texts])
+                start = 0
+                for pending in batch:
+                    pending.predictions = predictions[start:start + len(pending.texts)]
+                    start += len(pending.texts)
+            except Exception as e:
+                for pending in batch:
+                    pending.error = e
+            finally:
+                for pending in batch:
+                    pending.done.set()
+
+
+def create_server(backend: EmotionBackend, host: str, port: int, max_batch_size: int, max_wait: float) -> ThreadingHTTPServer:
+    """
+    HTTP server for the emotion model
+
+    POST /score {"texts": [...]} -> {"model_id": ..., "predictions": [...]}
+    GET /health -> {"status": "ok", "model_id": ...}
+    """
+    batcher = DynamicBatcher(backend, max_batch_size=max_batch_size, max_wait=max_wait)
+
+    class Handler(BaseHTTPRequestHandler):
+        def _send_json(self, status: int, body: dict):
+            data = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            if self.path != "/health":
+                return self._send_json(404, {"error": "Not found"})
+            self._send_json(200, {"status": "ok", "model_id": backend.model_id})
+
+        def do_POST(self):
+            if self.path != "/score":
+                return self._send_json(404, {"error": "Not found"})
+            try:
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+                texts = body["texts"]
+                if not isinstance(texts, list) or not all(isinstance(text, str) for text in texts):
+                    raise ValueError("texts must be a list of strings")
+            except (ValueError, KeyError, TypeError) as e:
+                return self._send_json(400, {"error": f"Invalid request: {e}"})
+
+            try:
+                predictions = batcher.submit(texts) if texts else []
+            except Exception as e:
+                return self._send_json(500, {"error": str(e)})
+            self._send_json(200, {"model_id": backend.model_id, "predictions": predictions})
+
+        def log_message(self, format, *args):
+            # Per-request access logs would dominate the output under load
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    return server
@@ -0,0 +1,78 @@
+import hashlib
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class FakeCompletionServer:
+    """
+    Local stand-in for the OpenAI chat completions API
+
+    Answers POST .../chat/completions with a deterministic completion derived
+    from the request (streamed as SSE chunks when the request sets `stream`),
+    and counts calls so checks can tell cache hits from upstream requests.
+    Point OPENAI_BASE_URL at `url`.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0):
+        self.calls = 0
+        self._lock = threading.Lock()
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                if not self.path.rstrip("/").endswith("chat/completions"):
+                    self.send_error(404)
+                    return
+                with fake._lock:
+                    fake.calls += 1
+                    call = fake.calls
+
+                digest = hashlib.sha256(body).hexdigest()[:12]
+                content = f"Fake completion {digest} (call {call})"
+                if json.loads(body or b"{}").get("stream"):
+                    return self._stream(content)
+
+                data = json.dumps({
+                    "id": f"chatcmpl-fake-{call}",
+                    "object": "chat.completion",
+                    "choices": [{
+                        "index": 0,
+                        "message": {"role": "assistant", "content": content},
+                        "finish_reason": "stop"
+                    }]
+                }).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _stream(self, content):
+                # One SSE chunk per word, closed by [DONE] and the connection (HTTP/1.0)
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.end_headers()
+                words = content.split(" ")
+                for i, word in enumerate(words):
+                    delta = {"content": word if i == 0 else f" {word}"}
+                    chunk = {"object": "chat.completion.chunk", "choices": [{"index": 0, "delta": delta}]}
+                    self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+                    self.wfile.flush()
+                self.wfile.write(b"data: [DONE]\n\n")
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://{host}:{self.server.server_address[1]}/v1"
+
+    def __enter__(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
@@ -0,0 +1,124 @@
+import os
+import random
+import threading
+import time
+from typing import Dict
+import requests
+from requests.adapters import HTTPAdapter
+from app.config import config
+
+# Worth retrying: rate limits and upstream/server errors
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# A read timeout may mean a POST was already processed (and billed); only retry
+# POSTs that never reached the upstream. ConnectTimeout is a ConnectionError.
+RETRY_ERRORS = (requests.exceptions.ConnectionError, requests.exceptions.Timeout)
+POST_RETRY_ERRORS = (requests.exceptions.ConnectionError,)
+
+
+class UpstreamClient:
+    """
+    Pooled keep-alive HTTP client for one upstream API
+
+    The `requests.Session` (and so its TCP/TLS connections) is created lazily
+    once per process and reused by every call. Requests are retried on
+    connection errors, timeouts, 429 and 5xx with full-jitter exponential
+    backoff, honoring a numeric Retry-After. POSTs are not retried on read
+    timeouts, which could repeat work the upstream already did. After the last
+    attempt the final response is returned (or the error raised) for the
+    caller to handle.
+    """
+
+    def __init__(self, base_url: str, pool_size: int = 10, connect_timeout: float = 3.05,
+                 read_timeout: float = 30, max_retries: int = 2, backoff_base: float = 0.5, backoff_max: float = 8):
+        self.base_url = base_url.rstrip("/")
+        self.pool_size = pool_size
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._session = None
+        self._session_pid = None
+        self._lock = threading.Lock()
+
+    @property
+    def session(self) -> requests.Session:
+        # Forked workers must not share the parent's sockets
+        if self._session is None or self._session_pid != os.getpid():
+            with self._lock:
+                if self._session is None or self._session_pid != os.getpid():
+                    session = requests.Session()
+                    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size, max_retries=0)
+                    session.mount("https://", adapter)
+                    session.mount("http://", adapter)
+                    self._session = session
+                    self._session_pid = os.getpid()
+        return self._session
+
+    def url(self, path: str = "") -> str:
+        return f"{self.base_url}/{path.lstrip('/')}" if path else self.base_url
+
+    def _backoff(self, attempt: int, response: requests.Response = None) -> float:
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+        if retry_after and retry_after.isdigit():
+            return min(float(retry_after), self.backoff_max)
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def request(self, method: str, path: str = "", **kwargs) -> requests.Response:
+        kwargs.setdefault("timeout", self.timeout)
+        retry_errors = POST_RETRY_ERRORS if method.upper() == "POST" else RETRY_ERRORS
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = self.session.request(method, self.url(path), **kwargs)
+            except retry_errors:
+                if attempt == self.max_retries:
+                    raise
+                time.sleep(self._backoff(attempt))
+                continue
+
+            if response.status_code not in RETRY_STATUSES or attempt == self.max_retries:
+                return response
+            backoff = self._backoff(attempt, response)
+            # Hand the connection back to the pool (streamed bodies are never read)
+            response.close()
+            time.sleep(backoff)
+
+    def post(self, path: str = "", **kwargs) -> requests.Response:
+        return self.request("POST", path, **kwargs)
+
+
+_clients: Dict[str, UpstreamClient] = {}
+_clients_lock = threading.Lock()
+
+
+def _get_client(name: str, factory) -> UpstreamClient:
+    client = _clients.get(name)
+    if client is None:
+        with _clients_lock:
+            client = _clients.setdefault(name, factory())
+    return client
+
+
+def hf_client() -> UpstreamClient:
+    """Hugging Face Inference API (the base URL is the full model URL)"""
+    return _get_client("hf", lambda: UpstreamClient(
+        config.HUGGING_FACE_MODEL_URL,
+        pool_size=config.HF_POOL_SIZE,
+        connect_timeout=config.HTTP_CONNECT_TIMEOUT,
+        read_timeout=config.HF_READ_TIMEOUT,
+        max_retries=config.HTTP_MAX_RETRIES,
+        backoff_base=config.HTTP_BACKOFF_BASE,
+        backoff_max=config.HTTP_BACKOFF_MAX
+    ))
+
+
+def openai_client() -> UpstreamClient:
+    return _get_client("openai", lambda: UpstreamClient(
+        config.OPENAI_BASE_URL,
+        pool_size=config.OPENAI_POOL_SIZE,
+        connect_timeout=config.HTTP_CONNECT_TIMEOUT,
+        read_timeout=config.OPENAI_READ_TIMEOUT,
+        max_retries=config.HTTP_MAX_RETRIES,
+        backoff_base=config.HTTP_BACKOFF_BASE,
+        backoff_max=config.HTTP_BACKOFF_MAX
+    ))
@@ -1,8 +1,9 @@
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, List, Tuple
 from app.models.note import Note
 from app.models.user_memory import UserMemory
 from app.extensions import db
-from app.utils.api_utils import create_memory_summary
+from app.utils.versioning import bump_user_version
+from app.utils.user_counters import get_user_counters, reset_memory_counter
 
 class MemoryManager:
     """Manages user memories and context building for advice generation"""
@@ -14,20 +15,9 @@ class MemoryManager:
     @staticmethod
     def should_create_memory(user_id: int) -> bool:
         """Check if we should create a new memory from recent notes"""
-        # Get last memory
-        last_memory = UserMemory.query.filter_by(user_id=user_id)\
-            .order_by(UserMemory.created_at.desc()).first()
-        
-        if not last_memory:
-            # First memory after reaching threshold
-            total_notes = Note.query.filter_by(user_id=user_id).count()
-            return total_notes >= MemoryManager.NOTES_PER_MEMORY
-        
-        # Count notes since last memory
-        notes_since_memory = Note.query.filter_by(user_id=user_id)\
-            .filter(Note.created_at > last_memory.created_at).count()
-        
-        return notes_since_memory >= MemoryManager.NOTES_PER_MEMORY
+        # Notes since the last memory (or all notes before the first one), from the counters row
+        counters = get_user_counters(user_id)
+        return counters is not None and counters.notes_since_memory >= MemoryManager.NOTES_PER_MEMORY
     
     @staticmethod
     def get_notes_for_memory(user_id: int) -> List[Note]:
@@ -66,56 +56,48 @@ class MemoryManager:
         return dominant_emotion[0], dominant_emotion[1], ""
     
     @staticmethod
-    def create_and_save_memory(user_id: int) -> Optional[UserMemory]:
-        """Create and save a new memory from recent notes"""
-        try:
-            notes = MemoryManager.get_notes_for_memory(user_id)
-            
-            if len(notes) < MemoryManager.NOTES_PER_MEMORY:
-                return None
-            
-            # Create summary
-            summary = create_memory_summary(notes)
-            
-            # Analyze batch
-            dominant_emotion, intensity, themes = MemoryManager.analyze_notes_batch(notes)
-            
-            # Create memory record
-            memory = UserMemory(
-                user_id=user_id,
-                summary=summary,
-                notes_count_in_batch=len(notes),
-                first_note_date=notes[0].created_at,
-                last_note_date=notes[-1].created_at,
-                dominant_emotion=dominant_emotion,
-                emotional_intensity=intensity,
-                themes=themes
-            )
-            
-            db.session.add(memory)
-            db.session.commit()
-            
-            print(f"Created memory {memory.id} for user {user_id}: {summary[:50]}...")
-            return memory
-            
-        except Exception as e:
-            print(f"Error creating memory for user {user_id}: {e}")
-            db.session.rollback()
-            return None
+    def build_memory(user_id: int, notes: List[Note], summary: str) -> UserMemory:
+        """Unsaved memory record for a batch of notes and its summary"""
+        dominant_emotion, intensity, themes = MemoryManager.analyze_notes_batch(notes)
+        
+        return UserMemory(
+            user_id=user_id,
+            summary=summary,
+            notes_count_in_batch=len(notes),
+            first_note_date=notes[0].created_at,
+            last_note_date=notes[-1].created_at,
+            dominant_emotion=dominant_emotion,
+            emotional_intensity=intensity,
+            themes=themes
+        )
     
     @staticmethod
-    def get_context_for_advice(user_id: int) -> Dict:
-        """Get memories + recent notes for advice generation"""
-        # Get recent memories (excluding current batch being processed)
-        memories = UserMemory.query.filter_by(user_id=user_id)\
+    def save_memory(memory: UserMemory) -> UserMemory:
+        """Save a memory and reset the user's memory counter"""
+        user_id = memory.user_id
+        db.session.add(memory)
+        reset_memory_counter(user_id)
+        db.session.commit()
+        bump_user_version(user_id)
+        
+        print(f"Created memory {memory.id} for user {user_id}: {memory.summary[:50]}...")
+        return memory
+    
+    @staticmethod
+    def get_recent_memories(user_id: int) -> List[UserMemory]:
+        return UserMemory.query.filter_by(user_id=user_id)\
             .order_by(UserMemory.created_at.desc())\
             .limit(MemoryManager.MAX_MEMORIES_FOR_ADVICE).all()
-        
-        # Get most recent notes (not yet in memory)
-        recent_notes = Note.query.filter_by(user_id=user_id)\
+    
+    @staticmethod
+    def get_recent_notes(user_id: int) -> List[Note]:
+        return Note.query.filter_by(user_id=user_id)\
             .order_by(Note.created_at.desc())\
             .limit(MemoryManager.RECENT_NOTES_FOR_ADVICE).all()
-        
+    
+    @staticmethod
+    def build_advice_context(memories: List[UserMemory], recent_notes: List[Note]) -> Dict:
+        """Advice context from already loaded memories and recent notes"""
         # Calculate current emotional state from recent notes
         current_emotions = {}
         if recent_notes:
@@ -135,4 +117,12 @@ class MemoryManager:
             'recent_notes': recent_notes,
             'current_emotions': current_emotions,
             'dominant_current_emotion': max(current_emotions.items(), key=lambda x: x[1])[0] if current_emotions else 'neutral'
-        }
\ No newline at end of file
+        }
+    
+    @staticmethod
+    def get_context_for_advice(user_id: int) -> Dict:
+        """Get memories + recent notes for advice generation"""
+        return MemoryManager.build_advice_context(
+            MemoryManager.get_recent_memories(user_id),
+            MemoryManager.get_recent_notes(user_id)
+        )
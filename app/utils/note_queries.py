@@ -0,0 +1,186 @@
+import base64
+import json
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import delete, insert, select, tuple_
+from sqlalchemy.orm import selectinload
+from sqlalchemy.orm.attributes import set_committed_value
+from app.extensions import db
+from app.models.formatting import Formatting, FormattingSchema
+from app.models.note import Note
+
+formattings_schema = FormattingSchema(many=True, exclude=("note_id",))
+
+# Columns a client may request through `fields=` on the note list
+NOTE_LIST_FIELDS = (
+    "id", "content", "created_at",
+    "anger_value", "disgust_value", "fear_value", "joy_value",
+    "neutral_value", "sadness_value", "surprise_value",
+    "formattings"  # not a column, loaded for the whole page in one extra query
+)
+DEFAULT_NOTE_LIST_FIELDS = ("id", "content", "created_at")
+
+
+def parse_fields(raw: Optional[str]) -> Tuple[str, ...]:
+    """
+    Parse a comma separated `fields=` value into a tuple of note columns
+
+    Raises:
+        ValueError: If an unknown field is requested
+    """
+    if not raw:
+        return DEFAULT_NOTE_LIST_FIELDS
+
+    requested = [field.strip() for field in raw.split(",") if field.strip()]
+    unknown = [field for field in requested if field not in NOTE_LIST_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+
+    # `id` is always returned, clients need it to address the note
+    return tuple(["id"] + [field for field in requested if field != "id"])
+
+
+def encode_cursor(created_at: datetime, note_id: int) -> str:
+    """Opaque keyset cursor pointing just past (created_at, id)"""
+    raw = json.dumps([created_at.isoformat(), note_id]).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, note_id = json.loads(base64.urlsafe_b64decode(padded))
+        return datetime.fromisoformat(created_at), int(note_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+def note_list_statement(user_id: int, fields: Tuple[str, ...], cursor: Optional[str] = None, limit: Optional[int] = None):
+    """
+    SELECT only the requested note columns for a user, in (created_at, id) order
+
+    `created_at` is always selected since the next cursor is built from it.
+    """
+    columns = [getattr(Note, field) for field in fields if field != "formattings"]
+    if "created_at" not in fields:
+        columns.append(Note.created_at)
+
+    stmt = select(*columns).where(Note.user_id == user_id)\
+        .order_by(Note.created_at, Note.id)
+
+    if cursor:
+        created_at, note_id = decode_cursor(cursor)
+        stmt = stmt.where(tuple_(Note.created_at, Note.id) > tuple_(created_at, note_id))
+
+    if limit is not None:
+        stmt = stmt.limit(limit)
+
+    return stmt
+
+
+def serialize_note_row(row, fields: Tuple[str, ...], formattings: Optional[Dict[int, List]] = None) -> dict:
+    data = {}
+    for field in fields:
+        if field == "formattings":
+            data[field] = formattings_schema.dump((formattings or {}).get(row.id, []))
+            continue
+        value = getattr(row, field)
+        if isinstance(value, datetime):
+            value = value.isoformat()
+        data[field] = value
+    return data
+
+
+def serialize_note_rows(rows: List, fields: Tuple[str, ...]) -> List[dict]:
+    """Serialize a page of rows, fetching formattings for all of them at once if requested"""
+    formattings = load_formattings([row.id for row in rows]) if "formattings" in fields else None
+    return [serialize_note_row(row, fields, formattings) for row in rows]
+
+
+def load_formattings(note_ids: Iterable[int]) -> Dict[int, List[Formatting]]:
+    """Formattings for many notes with a single SELECT, grouped by note_id"""
+    note_ids = list(note_ids)
+    grouped = defaultdict(list)
+    if not note_ids:
+        return grouped
+
+    formattings = db.session.execute(
+        select(Formatting).where(Formatting.note_id.in_(note_ids))
+        .order_by(Formatting.note_id, Formatting.id)
+    ).scalars()
+    for formatting in formattings:
+        grouped[formatting.note_id].append(formatting)
+    return grouped
+
+
+def get_note_with_formattings(note_id: int) -> Optional[Note]:
+    """Load a note and its formattings up front instead of lazily on dump"""
+    return db.session.get(Note, note_id, options=[selectinload(Note.formattings)])
+
+
+def insert_formattings(note: Note, formattings: List[Formatting]):
+    """
+    Bulk insert formattings for a flushed note in one executemany INSERT
+
+    The note's `formattings` collection is populated from the returned rows,
+    so dumping the note afterwards doesn't lazy load it again.
+    """
+    inserted = []
+    if formattings:
+        inserted = db.session.scalars(
+            insert(Formatting).returning(Formatting),
+            [
+                {"note_id": note.id, "type": f.type, "location": f.location, "length": f.length}
+                for f in formattings
+            ]
+        ).all()
+    set_committed_value(note, "formattings", inserted)
+
+
+def replace_formattings(note: Note, formattings: List[Formatting]):
+    """Swap a note's formattings with one bulk DELETE and one bulk INSERT"""
+    db.session.execute(
+        delete(Formatting).where(Formatting.note_id == note.id),
+        execution_options={"synchronize_session": False}
+    )
+    insert_formattings(note, formattings)
+
+
+def bulk_insert_notes(user_id: int, notes_data: List[dict]) -> List[int]:
+    """
+    Insert many validated notes (and their formattings) with executemany INSERTs
+
+    Returns the new note ids in the same order as `notes_data`. Does not commit.
+    """
+    # Imported notes without an original date share one timestamp; `id` keeps their order
+    now = db.session.execute(select(db.func.now())).scalar()
+    note_ids = db.session.execute(
+        insert(Note).returning(Note.id, sort_by_parameter_order=True),
+        [
+            {"user_id": user_id, "content": data["content"], "created_at": data.get("created_at") or now}
+            for data in notes_data
+        ]
+    ).scalars().all()
+
+    formatting_rows = [
+        {"note_id": note_id, "type": f["type"], "location": f["location"], "length": f["length"]}
+        for note_id, data in zip(note_ids, notes_data)
+        for f in data.get("formattings") or []
+    ]
+    if formatting_rows:
+        db.session.execute(insert(Formatting), formatting_rows)
+
+    return note_ids
+
+
+def next_cursor(rows: List, limit: int) -> Optional[str]:
+    """Cursor for the following page, or None when this page is the last one"""
+    if len(rows) <= limit:
+        return None
+    last = rows[limit - 1]
+    return encode_cursor(last.created_at, last.id)
@@ -0,0 +1,205 @@
+import hashlib
+import math
+import os
+import threading
+from typing import Dict, List, Optional, Sequence
+from app.config import config
+from app.utils.cache import LRUCache
+
+# Non-neutral emotions; the strongest one is a note's intensity
+INTENSITY_EMOTIONS = ("anger", "disgust", "fear", "joy", "sadness", "surprise")
+
+
+class TokenCounter:
+    """
+    Counts and truncates prompt text by tokens
+
+    Uses a local `tokenizers` tokenizer.json (by default GPT-2's BPE, shipped
+    in app/resources, which splits English into at least as many tokens as the
+    OpenAI chat models' encodings). Nothing is downloaded at runtime; without the file a
+    conservative estimate of one token per 3 UTF-8 bytes is used instead.
+    Lengths of long texts (note contents, memory summaries) are cached by
+    content hash.
+    """
+
+    def __init__(self, tokenizer_path: str, cache_size: int = 10000):
+        self.tokenizer_path = tokenizer_path
+        self._tokenizer = None
+        self._loaded = False
+        self._lock = threading.Lock()
+        self._lengths = LRUCache(maxsize=cache_size)
+
+    def load(self) -> bool:
+        """
+        Load the tokenizer file once; call at process start so no request pays for it
+
+        Returns whether the tokenizer loaded. On failure an error is printed and
+        token counts fall back to the estimate.
+        """
+        if not self._loaded:
+            with self._lock:
+                if not self._loaded:
+                    if not self.tokenizer_path:
+                        print("WARNING: PROMPT_TOKENIZER is not set, estimating prompt tokens")
+                    elif not os.path.isfile(self.tokenizer_path):
+                        print(f"ERROR: Prompt tokenizer file {self.tokenizer_path} not found, estimating prompt tokens")
+                    else:
+                        try:
+                            from tokenizers import Tokenizer
+                            self._tokenizer = Tokenizer.from_file(self.tokenizer_path)
+                            self._tokenizer.no_truncation()
+                        except Exception as e:
+                            print(f"ERROR: Failed to load prompt tokenizer {self.tokenizer_path}, estimating prompt tokens: {e}")
+                            self._tokenizer = None
+                    self._loaded = True
+        return self._tokenizer is not None
+
+    @property
+    def tokenizer(self):
+        self.load()
+        return self._tokenizer
+
+    @staticmethod
+    def _estimate(text: str) -> int:
+        return math.ceil(len(text.encode("utf-8")) / 3)
+
+    def count(self, text: str) -> int:
+        if not text:
+            return 0
+        tokenizer = self.tokenizer
+        if tokenizer is None:
+            return self._estimate(text)
+        return len(tokenizer.encode(text, add_special_tokens=False).ids)
+
+    def count_cached(self, text: str) -> int:
+        """count() memoized by content hash, for texts that recur across prompts"""
+        key = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        length = self._lengths.get(key)
+        if length is None:
+            length = self.count(text)
+            self._lengths.set(key, length)
+        return length
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        """Longest prefix of `text` within `max_tokens`, marked with "..." when cut"""
+        if self.count_cached(text) <= max_tokens:
+            return text
+        if max_tokens <= 1:
+            return ""
+
+        # Leave room for the "..." marker
+        keep = max_tokens - 1
+        tokenizer = self.tokenizer
+        if tokenizer is not None:
+            offsets = tokenizer.encode(text, add_special_tokens=False).offsets
+            cut = text[:offsets[keep - 1][1]] if keep > 0 else ""
+        else:
+            cut = text[:keep * 3]
+        while cut and self.count(cut + "...") > max_tokens:
+            cut = cut[:-max(1, len(cut) // 10)]
+        return cut + "..." if cut else ""
+
+
+class PromptItem:
+    """One numbered line of a prompt section; higher `priority` is kept first"""
+
+    def __init__(self, content: str, priority: float, label: str = ""):
+        self.content = content
+        self.priority = priority
+        self.label = label
+
+
+class PromptSection:
+    """
+    A list of items rendered one per line with `line_format`
+    (fields: i, label, content), under an optional title
+    """
+
+    def __init__(self, items: Sequence[PromptItem], line_format: str = "{i}. {label}{content}", title: str = None):
+        self.items = list(items)
+        self.line_format = line_format
+        self.title = title
+
+
+def _render(head: List[str], sections: List[PromptSection], tail: List[str], chosen: Dict[int, str]) -> str:
+    lines = list(head)
+    for section in sections:
+        included = [(item, chosen[id(item)]) for item in section.items if id(item) in chosen]
+        if not included:
+            continue
+        if section.title:
+            lines.append(section.title)
+        for i, (item, content) in enumerate(included, 1):
+            lines.append(section.line_format.format(i=i, label=item.label, content=content))
+        lines.append("")
+    lines.extend(tail)
+    return "\n".join(lines)
+
+
+def build_budgeted_prompt(head: List[str], sections: List[PromptSection], tail: List[str],
+                          budget: int, counter: Optional["TokenCounter"] = None) -> str:
+    """
+    Render head, sections and tail, fitting section items into `budget` tokens
+
+    Items are admitted in priority order: whole if they fit, otherwise
+    truncated to the remaining room (when at least PROMPT_MIN_ITEM_TOKENS are
+    left), otherwise skipped. Admitted items keep their original order. The
+    rendered prompt is then re-counted and the lowest-priority items dropped
+    until it fits, so the result never exceeds the budget.
+    """
+    counter = counter or get_token_counter()
+    min_item_tokens = config.PROMPT_MIN_ITEM_TOKENS
+
+    remaining = budget - counter.count(_render(head, [], tail, {}))
+    for section in sections:
+        if section.title and section.items:
+            remaining -= counter.count(section.title) + 1
+        # The blank line closing each section
+        remaining -= 1
+
+    chosen = {}
+    ranked = sorted(
+        ((item, section) for section in sections for item in section.items),
+        key=lambda pair: pair[0].priority, reverse=True
+    )
+    for item, section in ranked:
+        # Count the line's numbering/label with the widest index it can get, plus its newline
+        line_prefix = section.line_format.format(i=len(section.items), label=item.label, content="")
+        line_cost = counter.count(line_prefix) + 1
+        content_tokens = counter.count_cached(item.content)
+        if line_cost + content_tokens <= remaining:
+            chosen[id(item)] = item.content
+            remaining -= line_cost + content_tokens
+        elif remaining - line_cost >= min_item_tokens:
+            chosen[id(item)] = counter.truncate(item.content, remaining - line_cost)
+            remaining = 0
+
+    prompt = _render(head, sections, tail, chosen)
+    drop_order = [item for item, _ in reversed(ranked) if id(item) in chosen]
+    while counter.count(prompt) > budget and drop_order:
+        del chosen[id(drop_order.pop(0))]
+        prompt = _render(head, sections, tail, chosen)
+
+    if counter.count(prompt) > budget:
+        # Even the fixed text is over budget
+        prompt = counter.truncate(prompt, budget)
+    return prompt
+
+
+def note_intensity(note) -> float:
+    return max(getattr(note, f"{emotion}_value") or 0.0 for emotion in INTENSITY_EMOTIONS)
+
+
+def recency_priority(rank: int) -> float:
+    """1 for the newest item, decaying with age; comparable to an intensity in [0, 1]"""
+    return 1.0 / (1 + rank)
+
+
+_token_counter = None
+
+
+def get_token_counter() -> TokenCounter:
+    global _token_counter
+    if _token_counter is None:
+        _token_counter = TokenCounter(config.PROMPT_TOKENIZER, cache_size=config.PROMPT_TOKEN_CACHE_SIZE)
+    return _token_counter
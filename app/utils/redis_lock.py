@@ -0,0 +1,44 @@
+import uuid
+
+# Only the holder (matching token) may release or extend the lock
+_RELEASE_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+_EXTEND_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('pexpire', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+
+class RedisLock:
+    """
+    Non-blocking Redis lock with a lease
+
+    The lease bounds how long a crashed holder can keep the lock.
+    """
+
+    def __init__(self, client, key: str, lease_seconds: float, token: str = None):
+        self.client = client
+        self.key = key
+        self.lease_ms = int(lease_seconds * 1000)
+        self.token = token or uuid.uuid4().hex
+
+    def acquire(self) -> bool:
+        return bool(self.client.set(self.key, self.token, nx=True, px=self.lease_ms))
+
+    def release(self) -> bool:
+        return bool(self.client.eval(_RELEASE_SCRIPT, 1, self.key, self.token))
+
+    def extend(self) -> bool:
+        return bool(self.client.eval(_EXTEND_SCRIPT, 1, self.key, self.token, self.lease_ms))
+
+    def holder(self):
+        """Token of the current holder, or None if the lock is free"""
+        token = self.client.get(self.key)
+        return token.decode("utf-8") if isinstance(token, bytes) else token
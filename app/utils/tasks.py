@@ -1,65 +1,73 @@
-import gc
 from celery import shared_task
+from sqlalchemy import select
 from app.models.note import Note
 from app.extensions import db
 from app.config import config
-from app.utils.api_utils import call_hf_emotion_api, generate_and_save_advice
-from app.utils.memory_manager import MemoryManager
-
-# Supported emotions to prevent API changes from breaking the model
-SUPPORTED_EMOTIONS = {
-    "anger",
-    "disgust", 
-    "fear",
-    "joy",
-    "neutral",
-    "sadness",
-    "surprise",
-}
+from app.utils.advice_pipeline import run_advice_pipeline
+from app.utils.emotion_backends import get_emotion_backend, emotion_score_cache
+from app.utils.emotion_scores import (
+    note_content_hash, superseded_result,
+    parse_emotion_scores, apply_emotion_scores, write_emotion_scores
+)
+from app.utils.emotion_batcher import emotion_batcher
+from app.utils.emotion_rollups import note_emotion_values, record_rollup_changes
+from app.utils.advice_trigger import finish_advice_generation
+from app.utils.versioning import bump_user_version
+from app.utils.worker_lifecycle import task_memory_stats
 
 @shared_task(bind=True, max_retries=3, default_retry_delay=30)
-def send_note(self, note_id, content):
+def send_note(self, note_id, content, content_hash=None):
     """
-    Analyze emotion in note content using Hugging Face API
+    Analyze emotion in note content using the configured emotion backend
+
+    When `content_hash` is given, the analysis is skipped if the note has been
+    edited since the task was queued (a newer task covers the final text).
     """
     try:
         # Input validation
         if not content or len(content.strip()) == 0:
             raise ValueError("Content cannot be empty")
         
-        # Call Hugging Face API
-        emotion_data = call_hf_emotion_api(content)
+        # Ignore tasks superseded by a later edit before paying for the API call
+        if content_hash is not None:
+            current_content = db.session.execute(
+                select(Note.content).where(Note.id == note_id)
+            ).scalar()
+            if current_content is None or note_content_hash(current_content) != content_hash:
+                return superseded_result(note_id, content)
+        
+        # Join a micro-batch: one scoring call and one bulk UPDATE for many notes
+        if config.EMOTION_MICRO_BATCHING:
+            result = emotion_batcher.submit(note_id, content, content_hash)
+            if result["status"] == "error":
+                raise Exception(result["error_message"])
+            return result
+        
+        # Score with the configured backend (hosted API or local model)
+        emotion_data = get_emotion_backend().score([content])[0]
         
         # Process emotion scores
-        emotion_scores = {}
-        if emotion_data:
-            for category in emotion_data:
-                emotion = category["label"].lower()
-                score = round(float(category["score"]), 3)
-                if emotion in SUPPORTED_EMOTIONS:
-                    emotion_scores[emotion] = score
-        
-        # Ensure we have all required emotions
-        for emotion in SUPPORTED_EMOTIONS:
-            if emotion not in emotion_scores:
-                emotion_scores[emotion] = 0.0
+        emotion_scores = parse_emotion_scores(emotion_data)
         
         # Update the Note in the database
         try:
-            note = Note.query.get(note_id)
+            note = db.session.get(Note, note_id, with_for_update=True)
             if not note:
                 raise ValueError(f"Note with ID {note_id} not found")
             
+            # The note may have been edited while the API call was in flight
+            if content_hash is not None and note_content_hash(note.content) != content_hash:
+                db.session.rollback()
+                return superseded_result(note_id, content)
+            
             # Map emotion scores to database fields
-            note.anger_value = emotion_scores.get('anger', 0.0)
-            note.disgust_value = emotion_scores.get('disgust', 0.0)
-            note.fear_value = emotion_scores.get('fear', 0.0)
-            note.joy_value = emotion_scores.get('joy', 0.0)
-            note.neutral_value = emotion_scores.get('neutral', 0.0)
-            note.sadness_value = emotion_scores.get('sadness', 0.0)
-            note.surprise_value = emotion_scores.get('surprise', 0.0)
+            previous_scores = note_emotion_values(note)
+            apply_emotion_scores(note, emotion_scores)
+            record_rollup_changes([(note.user_id, note.created_at, previous_scores, emotion_scores)])
             
+            user_id = note.user_id
             db.session.commit()
+            bump_user_version(user_id)
             
         except Exception as e:
             db.session.rollback()
@@ -89,10 +97,14 @@ def send_note(self, note_id, content):
         
         # For final failure, still try to update note with neutral values
         try:
-            note = Note.query.get(note_id)
+            note = db.session.get(Note, note_id, with_for_update=True)
             if note:
+                previous_scores = note_emotion_values(note)
                 note.neutral_value = 1.0
+                record_rollup_changes([(note.user_id, note.created_at, previous_scores, note_emotion_values(note))])
+                user_id = note.user_id
                 db.session.commit()
+                bump_user_version(user_id)
         except:
             pass
         
@@ -103,26 +115,71 @@ def send_note(self, note_id, content):
             "status": "error",
             "error_message": error_msg
         }
+
+@shared_task(bind=True)
+def send_notes_batch(self, note_ids):
+    """
+    Analyze emotion for many (e.g. imported) notes in a single task, chunk by chunk
+    """
+    chunk_size = config.EMOTION_BATCH_CHUNK_SIZE
+    backend = get_emotion_backend()
+    succeeded, failed = 0, 0
     
-    finally:
-        # Clean up memory
-        gc.collect()
+    for start in range(0, len(note_ids), chunk_size):
+        chunk = note_ids[start:start + chunk_size]
+        notes = db.session.execute(
+            select(Note.id, Note.content).where(Note.id.in_(chunk))
+        ).all()
+        
+        try:
+            # Score the whole chunk in one backend call
+            predictions = backend.score([note.content for note in notes])
+        except Exception as e:
+            print(f"Batch emotion analysis failed, falling back to one note at a time: {e}")
+            predictions = None
+        
+        scores = {}
+        for i, note in enumerate(notes):
+            try:
+                emotion_data = predictions[i] if predictions is not None else backend.score([note.content])[0]
+                scores[note.id] = parse_emotion_scores(emotion_data)
+                succeeded += 1
+            except Exception as e:
+                print(f"Emotion analysis failed for imported note {note.id}: {e}")
+                scores[note.id] = parse_emotion_scores([{"label": "neutral", "score": 1.0}])
+                failed += 1
+        
+        # One bulk UPDATE and commit per chunk keeps progress if the worker dies mid-import
+        try:
+            write_emotion_scores(scores)
+        except Exception:
+            db.session.rollback()
+            raise
+    
+    return {
+        "notes_total": len(note_ids),
+        "succeeded": succeeded,
+        "failed": failed,
+        "status": "success" if not failed else "partial"
+    }
 
 @shared_task(bind=True, max_retries=2, default_retry_delay=60)
-def generate_advice_task(self, user_id):
+def generate_advice_task(self, user_id, lock_token=None, trigger_key=None):
     """
     Generate advice for user asynchronously with memory system
+
+    Enqueue through `start_advice_generation`, which passes the per-user
+    `lock_token` this task releases when it finishes (kept across retries)
+    and the `trigger_key` it clears unless advice was saved.
     """
     print(f"Starting advice generation task for user {user_id} (task_id: {self.request.id})")
+    retrying = False
+    succeeded = False
     try:        
-        # Create memory first if needed
-        if MemoryManager.should_create_memory(user_id):
-            memory = MemoryManager.create_and_save_memory(user_id)
-            if memory:
-                print(f"Created memory {memory.id} before generating advice")
-        
-        # Generate advice using new memory-based system
-        advice = generate_and_save_advice(user_id)
+        # Create any due memory and generate advice, overlapping the independent steps.
+        # The task id is kept across retries, so only retries reuse a cached completion
+        advice, timings = run_advice_pipeline(user_id, self.request.id)
+        succeeded = True
         
         return {
             "user_id": user_id,
@@ -130,6 +187,7 @@ def generate_advice_task(self, user_id):
             "content": advice.content,
             "memories_used": advice.memories_used_count,
             "recent_notes_used": advice.recent_notes_used_count,
+            "timings_ms": timings,
             "status": "success"
         }
             
@@ -146,6 +204,7 @@ def generate_advice_task(self, user_id):
             "loading" in error_str):
             if self.request.retries < self.max_retries:
                 print(f"Retrying advice generation due to recoverable error (attempt {self.request.retries + 1})")
+                retrying = True
                 raise self.retry(exc=e, countdown=60)
         
         return {
@@ -153,11 +212,16 @@ def generate_advice_task(self, user_id):
             "status": "error",
             "error_message": error_msg
         }
+    
+    finally:
+        finish_advice_generation(user_id, lock_token, retrying, trigger_key=trigger_key, succeeded=succeeded)
 
 @shared_task
 def health_check():
     """Health check task"""
     return {
         "status": "healthy",
-        "timestamp": str(db.func.now())
+        "timestamp": str(db.func.now()),
+        "emotion_cache": emotion_score_cache.stats(),
+        "task_memory": task_memory_stats()
     }
\ No newline at end of file
@@ -0,0 +1,101 @@
+from datetime import datetime, timezone
+from typing import List, Optional
+from sqlalchemy import case, func, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from app.extensions import db
+from app.models.user_counters import UserCounters
+
+# None of these commit: they run in the transaction that adds/removes the notes
+# (or saves the advice/memory), so counters and rows can never disagree.
+
+
+def record_notes_added(user_id: int, count: int = 1, created_ats: Optional[List[Optional[datetime]]] = None):
+    """
+    Count newly inserted notes
+
+    Notes created "now" always count towards the next advice and memory. Pass
+    `created_ats` for imported notes carrying their original dates: those older
+    than the last advice/memory only add to the total, like the count queries
+    these counters replace.
+    """
+    if created_ats is None or all(created_at is None for created_at in created_ats):
+        stmt = pg_insert(UserCounters).values(
+            user_id=user_id, notes_total=count, notes_since_advice=count, notes_since_memory=count
+        )
+        db.session.execute(stmt.on_conflict_do_update(
+            index_elements=[UserCounters.user_id],
+            set_={
+                "notes_total": UserCounters.notes_total + count,
+                "notes_since_advice": UserCounters.notes_since_advice + count,
+                "notes_since_memory": UserCounters.notes_since_memory + count,
+                "updated_at": func.now()
+            }
+        ))
+        return
+
+    db.session.execute(
+        pg_insert(UserCounters).values(user_id=user_id).on_conflict_do_nothing(index_elements=[UserCounters.user_id])
+    )
+    counters = db.session.execute(
+        select(UserCounters.last_advice_at, UserCounters.last_memory_at)
+        .where(UserCounters.user_id == user_id)
+        .with_for_update()
+    ).one()
+
+    def newer_than(created_at, since):
+        if created_at is None or since is None:
+            return True
+        if created_at.tzinfo is None:
+            created_at = created_at.replace(tzinfo=timezone.utc)
+        return created_at > since
+
+    db.session.execute(
+        update(UserCounters).where(UserCounters.user_id == user_id).values(
+            notes_total=UserCounters.notes_total + len(created_ats),
+            notes_since_advice=UserCounters.notes_since_advice
+            + sum(newer_than(created_at, counters.last_advice_at) for created_at in created_ats),
+            notes_since_memory=UserCounters.notes_since_memory
+            + sum(newer_than(created_at, counters.last_memory_at) for created_at in created_ats)
+        )
+    )
+
+
+def record_note_removed(user_id: int, created_at: Optional[datetime]):
+    """Uncount a deleted note, only from the windows it was counted in"""
+    def decrement(counter, since):
+        counted = 1 if created_at is None else case((since.is_(None), 1), (since < created_at, 1), else_=0)
+        return func.greatest(counter - counted, 0)
+
+    db.session.execute(
+        update(UserCounters).where(UserCounters.user_id == user_id).values(
+            notes_total=func.greatest(UserCounters.notes_total - 1, 0),
+            notes_since_advice=decrement(UserCounters.notes_since_advice, UserCounters.last_advice_at),
+            notes_since_memory=decrement(UserCounters.notes_since_memory, UserCounters.last_memory_at)
+        )
+    )
+
+
+def reset_advice_counter(user_id: int):
+    db.session.execute(
+        update(UserCounters).where(UserCounters.user_id == user_id)
+        .values(notes_since_advice=0, last_advice_at=func.now())
+    )
+
+
+def reset_memory_counter(user_id: int):
+    db.session.execute(
+        update(UserCounters).where(UserCounters.user_id == user_id)
+        .values(notes_since_memory=0, last_memory_at=func.now())
+    )
+
+
+def get_user_counters(user_id: int):
+    """The user's counters row (notes_total, notes_since_advice, ...), or None if they have no notes yet"""
+    return db.session.execute(
+        select(
+            UserCounters.notes_total,
+            UserCounters.notes_since_advice,
+            UserCounters.notes_since_memory,
+            UserCounters.last_advice_at
+        ).where(UserCounters.user_id == user_id)
+    ).first()
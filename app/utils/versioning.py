@@ -0,0 +1,76 @@
+import hashlib
+import time
+from functools import wraps
+from typing import Optional
+from flask import request, make_response
+from app.extensions import get_redis_client
+
+# Versions outlive any client cache; an evicted key just forces one refetch
+VERSION_TTL_SECONDS = 30 * 24 * 3600
+
+
+def _version_key(user_id: int) -> str:
+    return f"techtive:user_version:{user_id}"
+
+
+def bump_user_version(user_id: int):
+    """
+    Mark a user's notes/advice/memories as changed.
+
+    Call this AFTER the change is committed, so a reader can never pair the
+    new version with old data. Versions are nanosecond timestamps rather than
+    a plain INCR, so a lost key can't restart at a value a client has seen.
+    """
+    client = get_redis_client()
+    if client is None:
+        return
+    try:
+        client.set(_version_key(user_id), time.time_ns(), ex=VERSION_TTL_SECONDS)
+    except Exception as e:
+        print(f"WARNING: Failed to bump data version for user {user_id}: {e}")
+
+
+def get_user_version(user_id: int) -> Optional[str]:
+    """Current data version for a user, or None if Redis is unavailable"""
+    client = get_redis_client()
+    if client is None:
+        return None
+    try:
+        version = client.get(_version_key(user_id))
+        if version is None:
+            client.set(_version_key(user_id), time.time_ns(), ex=VERSION_TTL_SECONDS, nx=True)
+            version = client.get(_version_key(user_id))
+        return version.decode("utf-8") if isinstance(version, bytes) else version
+    except Exception as e:
+        print(f"WARNING: Failed to read data version for user {user_id}: {e}")
+        return None
+
+
+def conditional_get(f):
+    """
+    Answer 304 Not Modified when the client's If-None-Match matches the user's data version.
+
+    The ETag is derived from the per-user version and the request path/query,
+    so it is computed without touching row data. Must be applied below
+    `firebase_auth_required` since it needs `request.user`.
+    """
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        version = get_user_version(request.user.id)
+        if version is None:
+            return f(*args, **kwargs)
+
+        etag = hashlib.sha1(f"{request.user.id}:{version}:{request.full_path}".encode("utf-8")).hexdigest()
+
+        if request.if_none_match.contains(etag):
+            response = make_response("", 304)
+        else:
+            response = make_response(f(*args, **kwargs))
+            if response.status_code != 200:
+                return response
+
+        response.set_etag(etag)
+        response.headers["Cache-Control"] = "private, no-cache"
+        return response
+
+    return decorated_function
@@ -0,0 +1,140 @@
+"""
+Celery worker process lifecycle: per-process setup and per-task memory tracking.
+
+Recycling of leaky children is left to Celery (worker_max_tasks_per_child /
+worker_max_memory_per_child in the CELERY config); this module makes the
+memory behavior of each task type visible so those limits can be tuned.
+"""
+
+import os
+import resource
+import threading
+import tracemalloc
+from celery.signals import task_postrun, task_prerun, worker_process_init
+from flask import Flask
+from app.config import config
+
+# RSS (MB) when each running task started, keyed by task id
+_rss_at_start = {}
+# Per task name: runs, total RSS growth and largest single-run growth (MB)
+_task_memory = {}
+_lock = threading.Lock()
+_last_snapshot = None
+
+# The app whose context worker setup runs in; signal handlers are connected once per process
+_app = None
+_signals_connected = False
+
+
+def current_rss_mb() -> float:
+    """Current resident set size; falls back to the peak where /proc is unavailable"""
+    try:
+        with open("/proc/self/statm") as f:
+            resident_pages = int(f.read().split()[1])
+        return resident_pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def task_memory_stats() -> dict:
+    """Current RSS and RSS growth per task name in this worker process"""
+    with _lock:
+        tasks = {
+            name: {
+                "runs": stats["runs"],
+                "avg_growth_mb": round(stats["total_growth_mb"] / stats["runs"], 2),
+                "max_growth_mb": round(stats["max_growth_mb"], 2)
+            }
+            for name, stats in _task_memory.items()
+        }
+    return {"rss_mb": round(current_rss_mb(), 1), "tasks": tasks}
+
+
+def _warm_emotion_backend():
+    """Build the emotion backend and load every model it wraps"""
+    from app.utils.emotion_backends import get_emotion_backend
+
+    backend = get_emotion_backend()
+    while backend is not None:
+        if hasattr(backend, "load"):
+            backend.load()
+        backend = getattr(backend, "backend", None)
+
+
+def _log_allocation_growth(task_name: str, growth_mb: float):
+    global _last_snapshot
+
+    snapshot = tracemalloc.take_snapshot().filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    ))
+    if _last_snapshot is None:
+        top = snapshot.statistics("lineno")[:10]
+    else:
+        top = snapshot.compare_to(_last_snapshot, "lineno")[:10]
+    _last_snapshot = snapshot
+
+    allocations = "\n".join(str(stat) for stat in top)
+    print(
+        f"WARNING: Task {task_name} grew RSS by {growth_mb:.1f} MB "
+        f"(now {current_rss_mb():.1f} MB); top allocations:\n{allocations}"
+    )
+
+
+def _setup_worker_process(**kwargs):
+    with _app.app_context():
+        from app.extensions import db, get_redis_client
+
+        # Connections inherited from the parent must not be reused after fork
+        db.engine.dispose(close=False)
+        get_redis_client()
+
+        if config.WORKER_WARM_EMOTION_BACKEND:
+            try:
+                _warm_emotion_backend()
+            except Exception as e:
+                # Tasks will retry loading on first use
+                print(f"ERROR: Failed to warm emotion backend: {e}")
+
+    if config.WORKER_TRACEMALLOC_ENABLED:
+        tracemalloc.start()
+
+
+def _record_rss_before(task_id=None, **kwargs):
+    _rss_at_start[task_id] = current_rss_mb()
+
+
+def _record_rss_after(task_id=None, task=None, **kwargs):
+    started = _rss_at_start.pop(task_id, None)
+    if started is None:
+        return
+
+    growth = current_rss_mb() - started
+    name = getattr(task, "name", "unknown")
+    with _lock:
+        stats = _task_memory.setdefault(name, {"runs": 0, "total_growth_mb": 0.0, "max_growth_mb": 0.0})
+        stats["runs"] += 1
+        stats["total_growth_mb"] += growth
+        stats["max_growth_mb"] = max(stats["max_growth_mb"], growth)
+
+    if config.WORKER_TRACEMALLOC_ENABLED and growth > config.WORKER_TRACEMALLOC_THRESHOLD_MB:
+        _log_allocation_growth(name, growth)
+
+
+def init_worker_lifecycle(app: Flask):
+    """
+    Connect the Celery signal handlers; they only fire inside worker processes
+
+    Safe to call for every app instance: the handlers are connected once and
+    worker setup runs in the most recently initialized app's context.
+    """
+    global _app, _signals_connected
+
+    _app = app
+    if _signals_connected:
+        return
+
+    worker_process_init.connect(_setup_worker_process, weak=False)
+    task_prerun.connect(_record_rss_before, weak=False)
+    task_postrun.connect(_record_rss_after, weak=False)
+    _signals_connected = True
@@ -0,0 +1,37 @@
+"""Add per-user timeline indexes
+
+Revision ID: 4c2f8a91d7e3
+Revises: cee6f377fc53
+Create Date: 2026-10-16 10:12:31.204518
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4c2f8a91d7e3'
+down_revision = 'cee6f377fc53'
+branch_labels = None
+depends_on = None
+
+TIMELINE_INDEXES = [
+    ('ix_notes_user_id_created_at', 'notes', ['user_id', 'created_at']),
+    ('ix_weekly_advices_user_id_created_at', 'weekly_advices', ['user_id', 'created_at']),
+    ('ix_user_memories_user_id_created_at', 'user_memories', ['user_id', 'created_at']),
+    ('ix_formatting_note_id', 'formatting', ['note_id']),
+]
+
+
+def upgrade():
+    # CREATE INDEX CONCURRENTLY can't run inside a transaction, and avoids
+    # locking the tables against writes while the indexes build on Postgres
+    with op.get_context().autocommit_block():
+        for name, table, columns in TIMELINE_INDEXES:
+            op.create_index(name, table, columns, unique=False, postgresql_concurrently=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for name, table, columns in reversed(TIMELINE_INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True)
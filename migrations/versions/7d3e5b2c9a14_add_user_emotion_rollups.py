@@ -0,0 +1,50 @@
+"""Add user emotion rollups
+
+Revision ID: 7d3e5b2c9a14
+Revises: 4c2f8a91d7e3
+Create Date: 2026-10-16 14:03:52.118204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7d3e5b2c9a14'
+down_revision = '4c2f8a91d7e3'
+branch_labels = None
+depends_on = None
+
+EMOTIONS = ['anger', 'disgust', 'fear', 'joy', 'neutral', 'sadness', 'surprise']
+
+
+def upgrade():
+    op.create_table('user_emotion_rollups',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('granularity', sa.String(length=4), nullable=False),
+    sa.Column('bucket_start', sa.Date(), nullable=False),
+    sa.Column('note_count', sa.Integer(), nullable=False),
+    *[sa.Column(f'{emotion}_sum', sa.Float(), nullable=False) for emotion in EMOTIONS],
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('user_id', 'granularity', 'bucket_start')
+    )
+
+    # Backfill from existing scored notes (unscored notes still have all-zero scores).
+    # Buckets are UTC days and Monday-start weeks, matching app.utils.emotion_rollups.
+    sums = ', '.join(f'SUM({emotion}_value)' for emotion in EMOTIONS)
+    columns = ', '.join(f'{emotion}_sum' for emotion in EMOTIONS)
+    scored = ' + '.join(f'{emotion}_value' for emotion in EMOTIONS)
+    for granularity in ('day', 'week'):
+        op.execute(f"""
+            INSERT INTO user_emotion_rollups (user_id, granularity, bucket_start, note_count, {columns}, updated_at)
+            SELECT user_id, '{granularity}', date_trunc('{granularity}', created_at AT TIME ZONE 'UTC')::date,
+                   COUNT(*), {sums}, now()
+            FROM notes
+            WHERE created_at IS NOT NULL AND ({scored}) > 0
+            GROUP BY user_id, 3
+        """)
+
+
+def downgrade():
+    op.drop_table('user_emotion_rollups')
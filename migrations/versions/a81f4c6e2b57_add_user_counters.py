@@ -0,0 +1,52 @@
+"""Add user counters
+
+Revision ID: a81f4c6e2b57
+Revises: 7d3e5b2c9a14
+Create Date: 2026-10-16 15:21:07.640913
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a81f4c6e2b57'
+down_revision = '7d3e5b2c9a14'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('user_counters',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('notes_total', sa.Integer(), nullable=False),
+    sa.Column('notes_since_advice', sa.Integer(), nullable=False),
+    sa.Column('notes_since_memory', sa.Integer(), nullable=False),
+    sa.Column('last_advice_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('last_memory_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('user_id')
+    )
+
+    # Backfill with the same counts should_generate_advice/should_create_memory used to query
+    op.execute("""
+        INSERT INTO user_counters (user_id, notes_total, notes_since_advice, notes_since_memory,
+                                   last_advice_at, last_memory_at, updated_at)
+        SELECT u.id,
+               (SELECT COUNT(*) FROM notes n WHERE n.user_id = u.id),
+               (SELECT COUNT(*) FROM notes n WHERE n.user_id = u.id
+                    AND (a.last_at IS NULL OR n.created_at > a.last_at)),
+               (SELECT COUNT(*) FROM notes n WHERE n.user_id = u.id
+                    AND (m.last_at IS NULL OR n.created_at > m.last_at)),
+               a.last_at,
+               m.last_at,
+               now()
+        FROM users u
+        LEFT JOIN LATERAL (SELECT MAX(created_at) AS last_at FROM weekly_advices WHERE user_id = u.id) a ON true
+        LEFT JOIN LATERAL (SELECT MAX(created_at) AS last_at FROM user_memories WHERE user_id = u.id) m ON true
+    """)
+
+
+def downgrade():
+    op.drop_table('user_counters')